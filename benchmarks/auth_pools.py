@@ -0,0 +1,152 @@
+"""Requests per second of an authenticated endpoint, with the user looked up on a second async pool or on
+the session of the handler.
+
+Both variants run the real token check on `GET /flats/{flat_id}`, with the principal cache on and off
+(off is every request missing it). Also reports the most database connections held at once.
+Run with `uv run python -m benchmarks.auth_pools --requests 2000 --concurrency 16`.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import Depends
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.authentication import (
+    create_access_token,
+    get_current_reader,
+    get_current_user,
+    google_scheme,
+    oauth2_scheme,
+    resolve_principal,
+)
+from src.main import app
+from src.models import Flat, User
+from src.principals import Principal, principal_cache
+from src.utils import get_read_session, get_session
+
+EMAIL = "auth@bench"
+
+
+class ConnectionGauge:
+    """Most connections checked out at once, over every engine it watches."""
+
+    def __init__(self, *engines: Engine):
+        self.current = 0
+        self.peak = 0
+        for engine in engines:
+            event.listen(engine, "checkout", self.checkout)
+            event.listen(engine, "checkin", self.checkin)
+
+    def checkout(self, *_args):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def checkin(self, *_args):
+        self.current -= 1
+
+
+async def run(url: str, requests: int, concurrency: int) -> float:
+    token = create_access_token({"sub": EMAIL})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def worker(count: int):
+            for _ in range(count):
+                response = await client.get(
+                    url, headers={"Authorization": f"Bearer {token}"}
+                )
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(worker(requests // concurrency) for _ in range(concurrency))
+        )
+        return (requests // concurrency * concurrency) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{Path(directory) / 'bench.db'}"
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        async_engine = create_async_engine(url.replace("sqlite", "sqlite+aiosqlite"))
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            flat = Flat(
+                name="Bench",
+                users=[User(first_name="Auth", last_name="Bench", email=EMAIL)],
+            )
+            session.add(flat)
+            session.commit()
+            flat_url = f"/flats/{flat.id}"
+
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+
+        async def get_async_session_override():
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                yield session
+
+        # The lookup as it was, its session held until the response like `get_async_session`
+        async def principal_on_async_pool(
+            session: AsyncSession = Depends(get_async_session_override),
+            pw_token: str | None = Depends(oauth2_scheme),
+            google_token: HTTPAuthorizationCredentials | None = Depends(google_scheme),
+        ) -> Principal:
+            return await session.run_sync(resolve_principal, pw_token, google_token)
+
+        gauge = ConnectionGauge(engine, async_engine.sync_engine)
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        max_size = principal_cache.max_size
+
+        async def compare():
+            print(f"{'variant':<16}{'cache':<8}{'requests/s':>12}{'connections':>13}")
+            for cache in (True, False):
+                principal_cache.max_size = max_size if cache else 0
+                for variant in ("async pool", "handler session"):
+                    if variant == "async pool":
+                        app.dependency_overrides[get_current_user] = (
+                            principal_on_async_pool
+                        )
+                        app.dependency_overrides[get_current_reader] = (
+                            principal_on_async_pool
+                        )
+                    else:
+                        app.dependency_overrides.pop(get_current_user, None)
+                        app.dependency_overrides.pop(get_current_reader, None)
+                    principal_cache.clear()
+                    gauge.peak = 0
+                    rate = await run(flat_url, args.requests, args.concurrency)
+                    print(
+                        f"{variant:<16}{'on' if cache else 'off':<8}"
+                        f"{rate:>12.0f}{gauge.peak:>13}"
+                    )
+            await async_engine.dispose()
+
+        try:
+            asyncio.run(compare())
+        finally:
+            principal_cache.max_size = max_size
+            app.dependency_overrides.clear()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Latency of a cheap endpoint while the app is flooded with password logins.
+
+Compares bcrypt running inline on the event loop with the dedicated hashing pool.
+Run with `uv run python -m benchmarks.login_flood --logins 30 --requests 200`.
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from sqlmodel import Session, SQLModel, create_engine
+
+from src import hashing
+from src.main import app
+from src.models import User
+from src.routers import login
+from src.utils import get_session
+
+EMAIL = "flood@bench"
+PASSWORD = "pw"
+
+
+async def inline_check_hash(password: str, hashed_password: str) -> bool:
+    return hashing._bcrypt_check(password, hashed_password)
+
+
+async def run(
+    client: httpx.AsyncClient, logins: int, requests: int, concurrency: int
+) -> list[float]:
+    async def log_in():
+        await client.post("/token", data={"username": EMAIL, "password": PASSWORD})
+
+    async def timed_requests(count: int) -> list[float]:
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.get("/users/")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    flood = [asyncio.create_task(log_in()) for _ in range(logins)]
+    await asyncio.sleep(0)
+    results = await asyncio.gather(
+        *(timed_requests(requests // concurrency) for _ in range(concurrency))
+    )
+    await asyncio.gather(*flood)
+    return [latency for latencies in results for latency in latencies]
+
+
+def p99(latencies: list[float]) -> float:
+    return statistics.quantiles(latencies, n=100)[98]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{Path(directory) / 'bench.db'}",
+            connect_args={"check_same_thread": False},
+        )
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(
+                User(
+                    first_name="Flood",
+                    last_name="Bench",
+                    email=EMAIL,
+                    hashed_password=hashing.hash_password(PASSWORD),
+                )
+            )
+            session.commit()
+
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+
+        app.dependency_overrides[get_session] = get_session_override
+        transport = httpx.ASGITransport(app=app)
+
+        async def measure() -> list[float]:
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                return await run(client, args.logins, args.requests, args.concurrency)
+
+        pooled_check_hash = login.check_hash_async
+        login.check_hash_async = inline_check_hash
+        inline = asyncio.run(measure())
+        login.check_hash_async = pooled_check_hash
+        pooled = asyncio.run(measure())
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+    print(f"bcrypt inline: p99 {p99(inline) * 1000:.1f} ms")
+    print(f"bcrypt pooled: p99 {p99(pooled) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Compares the per-item move path with the bulk ledger writer.
+
+Run with `uv run python -m benchmarks.moves --users 8 --items 300`.
+"""
+
+import argparse
+import statistics
+import time
+from datetime import date
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+from src import ledger
+from src.buy_in import item_buy_in
+from src.buy_out import item_buy_out
+from src.models import Flat, Item, User, UserItems
+
+MOVE_DATE = date(2026, 1, 1)
+
+
+def build_flat(session: Session, users: int, items: int) -> tuple[int, int]:
+    """Seeds one flat where every user owns every item, plus one user waiting to move in."""
+    flat = Flat(name="Benchmark")
+    session.add(flat)
+    session.commit()
+    session.refresh(flat)
+    session.execute(
+        insert(User),
+        [
+            {
+                "first_name": "User",
+                "last_name": str(i),
+                "email": f"user{i}@bench",
+                "flat_id": flat.id if i < users else None,
+            }
+            for i in range(users + 1)
+        ],
+    )
+    session.execute(
+        insert(Item),
+        [
+            {
+                "name": f"Item {i}",
+                "flat_id": flat.id,
+                "is_bill": False,
+                "initial_value": 100.0 + i,
+                "purchase_date": date(2024, 1, 1),
+                "yearly_depreciation": 0.1,
+                "minimum_value": None,
+                "minimum_value_pct": 0.1,
+            }
+            for i in range(items)
+        ],
+    )
+    session.execute(
+        insert(UserItems),
+        [
+            {"user_id": user_id, "item_id": item_id}
+            for user_id in range(1, users + 1)
+            for item_id in range(1, items + 1)
+        ],
+    )
+    session.commit()
+    return flat.id or 0, users + 1
+
+
+def legacy_move_in(session: Session, flat: Flat, user: User):
+    flat.users.append(user)
+    for item in flat.items:
+        item_buy_in(session, user, item, MOVE_DATE)
+        user.items.append(item)
+    session.commit()
+
+
+def bulk_move_in(session: Session, flat: Flat, user: User):
+    flat.users.append(user)
+    ledger.move_in(session, flat, user, MOVE_DATE, [])
+    session.commit()
+
+
+def legacy_move_out(session: Session, flat: Flat, user: User):
+    for item in user.items:
+        item_buy_out(session, user, item, MOVE_DATE)
+    user.flat = None
+    user.items = []
+    session.commit()
+
+
+def bulk_move_out(session: Session, flat: Flat, user: User):
+    ledger.move_out(session, flat, user, MOVE_DATE)
+    user.flat = None
+    session.commit()
+
+
+def time_move(move, users: int, items: int, moving_out: bool) -> float:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        flat_id, new_user_id = build_flat(session, users, items)
+        flat = session.get(Flat, flat_id)
+        user = session.get(User, 1 if moving_out else new_user_id)
+        if flat is None or user is None:
+            raise Exception("Benchmark data missing")
+        start = time.perf_counter()
+        move(session, flat, user)
+        elapsed = time.perf_counter() - start
+    engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("move_in", legacy_move_in, bulk_move_in, False),
+        ("move_out", legacy_move_out, bulk_move_out, True),
+    ]
+    for name, legacy, bulk, moving_out in cases:
+        legacy_time = statistics.median(
+            time_move(legacy, args.users, args.items, moving_out)
+            for _ in range(args.repeat)
+        )
+        bulk_time = statistics.median(
+            time_move(bulk, args.users, args.items, moving_out)
+            for _ in range(args.repeat)
+        )
+        print(
+            f"{name}: legacy {legacy_time * 1000:.1f} ms, "
+            f"bulk {bulk_time * 1000:.1f} ms, "
+            f"speedup x{legacy_time / bulk_time:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Concurrent writers and readers on a SQLite file, with and without the SQLite profile.
+
+Each writer reads a user then inserts a transaction, the pattern of the move and item endpoints.
+Run with `uv run python -m benchmarks.sqlite_contention --writers 8 --readers 4`.
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from src.models import Transaction, User
+from src.utils import apply_sqlite_profile
+
+
+def run(
+    profile: bool, directory: Path, writers: int, readers: int, iterations: int
+) -> tuple[float, int, int]:
+    url = f"sqlite:///{directory / ('profile.db' if profile else 'default.db')}"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    read_engine = create_engine(url, connect_args={"check_same_thread": False})
+    if profile:
+        apply_sqlite_profile(engine)
+        apply_sqlite_profile(read_engine, read_only=True)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(first_name="A", last_name="A", email="a@bench"))
+        session.add(User(first_name="B", last_name="B", email="b@bench"))
+        session.commit()
+
+    errors = 0
+    reads = 0
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def write():
+        nonlocal errors
+        for _ in range(iterations):
+            try:
+                with Session(engine) as session:
+                    session.exec(select(User).where(User.id == 1)).one()
+                    session.add(
+                        Transaction(
+                            creditor_id=1,
+                            debtor_id=2,
+                            item_id=1,
+                            amount=1.0,
+                            paid=False,
+                        )
+                    )
+                    session.commit()
+            except OperationalError:
+                with lock:
+                    errors += 1
+
+    def read():
+        nonlocal reads
+        while not done.is_set():
+            with Session(read_engine) as session:
+                session.exec(select(func.count()).select_from(Transaction)).one()
+            with lock:
+                reads += 1
+
+    reader_threads = [threading.Thread(target=read) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=write) for _ in range(writers)]
+    for thread in reader_threads:
+        thread.start()
+    start = time.perf_counter()
+    for thread in writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in reader_threads:
+        thread.join()
+    engine.dispose()
+    read_engine.dispose()
+    return elapsed, errors, reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    total = args.writers * args.iterations
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in (False, True):
+            elapsed, errors, reads = run(
+                profile, Path(directory), args.writers, args.readers, args.iterations
+            )
+            print(
+                f"{'profile' if profile else 'default'}: "
+                f"{(total - errors) / elapsed:.0f} writes/s, "
+                f"{errors}/{total} failed with 'database is locked', "
+                f"{reads / elapsed:.0f} reads/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Times the move, item and list endpoints and the depreciation functions on a synthetic flat.
+
+The flat has `--users` members sharing `--items` items and `--history` past transactions. Endpoints are
+timed through the app's `TestClient` on a temporary SQLite file, the move and depreciation functions
+directly. Results are written as JSON, and compared against `--baseline` when given: a case whose median
+is more than `--threshold` slower than the baseline is reported and makes the run exit with status 1.
+
+Run with `uv run python -m benchmarks.suite --output results.json --baseline benchmarks/baseline.json`.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from src import ledger, seed
+from src.authentication import (
+    get_current_reader,
+    get_current_user,
+    get_verified_user,
+)
+from src.depreciation import depreciate_items, depreciate_price
+from src.main import app
+from src.models import Flat, Item, User
+from src.utils import get_read_session, get_session
+
+MOVE_DATE = date(2026, 1, 1)
+
+
+def build_flat(session: Session, users: int, items: int, history: int) -> int:
+    """Seeds one flat where every member owns every item, with `history` past transactions.
+
+    Also adds one user outside the flat, who moves in and out during the benchmark."""
+    report = seed.generate(
+        session, 1, users, items, history, exclusion_rate=0, today=MOVE_DATE
+    )
+    session.add(User(first_name="New", last_name="User", email="newcomer@bench"))
+    session.commit()
+    return report.flats[0]
+
+
+def summarize(timings: list[float]) -> dict[str, float | int]:
+    timings = sorted(timings)
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))]
+        * 1000,
+        "min_ms": timings[0] * 1000,
+        "runs": len(timings),
+    }
+
+
+def timed(function: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run_suite(users: int, items: int, history: int, repeat: int) -> dict[str, dict]:
+    timings: dict[str, list[float]] = {}
+
+    def record(name: str, seconds: float):
+        timings.setdefault(name, []).append(seconds)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{Path(directory) / 'bench.db'}",
+            connect_args={"check_same_thread": False},
+        )
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            flat_id = build_flat(session, users, items, history)
+            member = session.get(User, 1)
+            if member is None:
+                raise Exception("Benchmark data missing")
+            session.expunge(member)
+            newcomer_id = users + 1
+            flat_items = session.exec(select(Item)).all()
+            session.expunge_all()
+
+        def get_session_override():
+            with Session(engine) as session:
+                yield session
+
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        app.dependency_overrides[get_current_user] = lambda: member
+        app.dependency_overrides[get_current_reader] = lambda: member
+        app.dependency_overrides[get_verified_user] = lambda: member
+        client = TestClient(app)
+
+        def request(method: str, url: str, **kwargs):
+            response = client.request(method, url, **kwargs)
+            if response.status_code != 200:
+                raise Exception(f"{method} {url}: {response.status_code}")
+
+        try:
+            for run in range(repeat):
+                record(
+                    "api.user_move_in",
+                    timed(
+                        lambda: request(
+                            "POST",
+                            f"/flats/{flat_id}/move_in/{newcomer_id}",
+                            params={"date": MOVE_DATE.isoformat()},
+                            json=[],
+                        )
+                    ),
+                )
+                record(
+                    "api.user_move_out",
+                    timed(
+                        lambda: request(
+                            "POST",
+                            f"/flats/{flat_id}/move_out/{newcomer_id}",
+                            params={"date": MOVE_DATE.isoformat()},
+                        )
+                    ),
+                )
+                item_id = run % items + 1
+                user_id = run % users + 1
+                date_params = {"date": MOVE_DATE.isoformat()}
+                request(
+                    "PATCH",
+                    f"/items/{item_id}/remove/{user_id}",
+                    params=date_params,
+                )
+                record(
+                    "api.add_user_to_item",
+                    timed(
+                        lambda: request(
+                            "PATCH",
+                            f"/items/{item_id}/add/{user_id}",
+                            params=date_params,
+                        )
+                    ),
+                )
+                for name, url in (
+                    ("api.fetch_users", "/users/"),
+                    ("api.fetch_items", "/items/"),
+                    ("api.fetch_flats", "/flats/"),
+                    ("api.fetch_user_debts", f"/transactions/{user_id}/debts"),
+                ):
+                    record(name, timed(lambda: request("GET", url)))
+
+            with Session(engine) as session:
+                for _ in range(repeat):
+                    flat = session.get(Flat, flat_id)
+                    newcomer = session.get(User, newcomer_id)
+                    if flat is None or newcomer is None:
+                        raise Exception("Benchmark data missing")
+                    start = time.perf_counter()
+                    flat.users.append(newcomer)
+                    ledger.move_in(session, flat, newcomer, MOVE_DATE, [])
+                    session.commit()
+                    record("ledger.move_in", time.perf_counter() - start)
+                    start = time.perf_counter()
+                    ledger.move_out(session, flat, newcomer, MOVE_DATE)
+                    newcomer.flat = None
+                    session.commit()
+                    record("ledger.move_out", time.perf_counter() - start)
+        finally:
+            app.dependency_overrides.clear()
+            engine.dispose()
+
+    dates = [MOVE_DATE]
+    for _ in range(repeat):
+        record(
+            "depreciate_price",
+            timed(lambda: [depreciate_price(item, MOVE_DATE) for item in flat_items]),
+        )
+        record("depreciate_items", timed(lambda: depreciate_items(flat_items, dates)))
+
+    return {name: summarize(values) for name, values in timings.items()}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(
+    results: dict[str, dict], baseline: dict[str, dict], threshold: float
+) -> list[str]:
+    """Cases whose median is more than `threshold` slower than in the baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median_ms"] / baseline[name]["median_ms"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {result['median_ms']:.2f} ms vs "
+                f"{baseline[name]['median_ms']:.2f} ms (x{ratio:.2f})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--history", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run_suite(args.users, args.items, args.history, args.repeat)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "users": args.users,
+            "items": args.items,
+            "history": args.history,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    for name, result in results.items():
+        print(
+            f"{name}: median {result['median_ms']:.2f} ms, "
+            f"p95 {result['p95_ms']:.2f} ms"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["config"] != report["config"]:
+            print("Baseline was run with another configuration, not comparing")
+            return
+        regressions = compare(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,13 @@ from pydantic import BaseModel
 from sqlmodel import Session, select
 
 from src.models import User
-from src.utils import get_session
+from src.principals import (
+    Principal,
+    cached_principal,
+    principal_cache,
+    remember_principal,
+)
+from src.utils import get_read_session, get_session
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -53,12 +59,12 @@ def create_access_token(data: dict, expires: timedelta | None = None):
     return encoded_jwt
 
 
-async def get_current_user(
-    *,
-    session: Session = Depends(get_session),
-    pw_token: str | None = Depends(oauth2_scheme),
-    google_token: HTTPAuthorizationCredentials | None = Depends(google_scheme),
-):
+def resolve_principal(
+    session: Session,
+    pw_token: str | None,
+    google_token: HTTPAuthorizationCredentials | None,
+    cached: bool = True,
+) -> Principal:
     token = None
     if google_token and pw_token:
         token = google_token.credentials
@@ -83,8 +89,46 @@ async def get_current_user(
     except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Could not validate credentials 2")
 
+    principal = cached_principal(email) if cached else None
+    if principal is not None:
+        return principal
+
+    generation = principal_cache.generation
     statement = select(User).where(User.email == token_data.email)
     user = session.exec(statement).one_or_none()
     if not user:
         raise HTTPException(status_code=401, detail="Could not validate credentials 3")
-    return user
+    return remember_principal(email, user, generation)
+
+
+def get_current_user(
+    *,
+    session: Session = Depends(get_session),
+    pw_token: str | None = Depends(oauth2_scheme),
+    google_token: HTTPAuthorizationCredentials | None = Depends(google_scheme),
+) -> Principal:
+    """The authenticated user, looked up on the session of the handler, so that a request never holds
+    connections from two pools."""
+    return resolve_principal(session, pw_token, google_token)
+
+
+def get_current_reader(
+    *,
+    session: Session = Depends(get_read_session),
+    pw_token: str | None = Depends(oauth2_scheme),
+    google_token: HTTPAuthorizationCredentials | None = Depends(google_scheme),
+) -> Principal:
+    """`get_current_user` for handlers on the read session."""
+    return resolve_principal(session, pw_token, google_token)
+
+
+def get_verified_user(
+    *,
+    session: Session = Depends(get_session),
+    pw_token: str | None = Depends(oauth2_scheme),
+    google_token: HTTPAuthorizationCredentials | None = Depends(google_scheme),
+) -> Principal:
+    """`get_current_user` read from the database, never from the principal cache, for the writes that
+    move money. Another worker may have moved the user out or deleted them since this worker cached
+    them."""
+    return resolve_principal(session, pw_token, google_token, cached=False)
@@ -0,0 +1,253 @@
+"""Balances materialized from the transaction ledger.
+
+`Balance` holds the unpaid credit and debt of every user within the flat of the items involved, and
+`PairBalance` what a debtor still owes a creditor. Every write that creates transactions or changes their
+`paid` flag calls `apply_transactions` before committing, so the tables move in the same database
+transaction as the ledger. `check_balances` rebuilds both from the raw transactions and lists the
+differences.
+
+Run with `uv run python -m src.balances` to check the database from `DATABASE_URL`, add `--fix` to
+replace the stored balances with the rebuilt ones."""
+
+from collections import defaultdict
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import delete, func, insert, literal, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, col, select
+
+from src.models import Balance, Item, PairBalance, Transaction
+
+# Differences below this are float rounding from the incremental updates
+TOLERANCE = 1e-6
+
+UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _upsert(session: Session, model: Any, rows: list[dict], keys: list[str]):
+    """Adds the non-key columns of `rows` to the stored ones, inserting missing rows."""
+    if not rows:
+        return
+    upsert = UPSERTS.get(session.get_bind().dialect.name)
+    if upsert is None:
+        _update_or_insert(session, model, rows, keys)
+        return
+    statement = upsert(model).values(rows)
+    table = model.__table__
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={
+            name: table.c[name] + statement.excluded[name]
+            for name in rows[0]
+            if name not in keys
+        },
+    )
+    session.execute(statement)
+
+
+def _update_or_insert(session: Session, model: Any, rows: list[dict], keys: list[str]):
+    """`_upsert` for databases without one: an `UPDATE` per row, then an `INSERT` of the rows it missed.
+
+    A concurrent insert of the same key fails the transaction with an integrity error instead of
+    adding up."""
+    table = model.__table__
+    missing = []
+    for row in rows:
+        result = session.execute(
+            update(table)
+            .where(*(table.c[key] == row[key] for key in keys))
+            .values(
+                {
+                    name: table.c[name] + value
+                    for name, value in row.items()
+                    if name not in keys
+                }
+            )
+        )
+        if result.rowcount == 0:
+            missing.append(row)
+    if missing:
+        session.execute(insert(table), missing)
+
+
+def apply_transactions(session: Session, rows: Sequence[dict], sign: int = 1):
+    """Adds unpaid transaction rows to the balances, or removes them with `sign=-1`.
+
+    Rows need `creditor_id`, `debtor_id`, `item_id` and `amount`. Transactions on items without a flat
+    only count towards `PairBalance`."""
+    if not rows:
+        return
+    item_ids = {row["item_id"] for row in rows}
+    flats = dict(
+        session.exec(
+            select(Item.id, Item.flat_id).where(col(Item.id).in_(item_ids))
+        ).all()
+    )
+    balances: dict[tuple[int, int], list[float]] = defaultdict(lambda: [0.0, 0.0])
+    pairs: dict[tuple[int, int], float] = defaultdict(float)
+    for row in rows:
+        amount = sign * row["amount"]
+        pairs[(row["creditor_id"], row["debtor_id"])] += amount
+        flat_id = flats.get(row["item_id"])
+        if flat_id is not None:
+            balances[(flat_id, row["creditor_id"])][0] += amount
+            balances[(flat_id, row["debtor_id"])][1] += amount
+    # Sorted keys make concurrent writers lock rows in the same order
+    _upsert(
+        session,
+        Balance,
+        [
+            {"flat_id": flat_id, "user_id": user_id, "credit": credit, "debt": debt}
+            for (flat_id, user_id), (credit, debt) in sorted(balances.items())
+        ],
+        ["flat_id", "user_id"],
+    )
+    _upsert(
+        session,
+        PairBalance,
+        [
+            {"creditor_id": creditor_id, "debtor_id": debtor_id, "amount": amount}
+            for (creditor_id, debtor_id), amount in sorted(pairs.items())
+        ],
+        ["creditor_id", "debtor_id"],
+    )
+
+
+def transaction_row(transaction: Transaction) -> dict:
+    return {
+        "creditor_id": transaction.creditor_id,
+        "debtor_id": transaction.debtor_id,
+        "item_id": transaction.item_id,
+        "amount": transaction.amount,
+    }
+
+
+def expected_balances(session: Session) -> dict[tuple[int, int], tuple[float, float]]:
+    """(credit, debt) of every user in every flat, summed from the unpaid transactions."""
+    unpaid = col(Transaction.paid) == False  # noqa: E712
+    on_item = col(Item.id) == Transaction.item_id
+    entries = union_all(
+        select(
+            col(Item.flat_id).label("flat_id"),
+            col(Transaction.creditor_id).label("user_id"),
+            col(Transaction.amount).label("credit"),
+            literal(0.0).label("debt"),
+        )
+        .join(Item, on_item)
+        .where(unpaid, col(Item.flat_id).is_not(None)),
+        select(
+            col(Item.flat_id).label("flat_id"),
+            col(Transaction.debtor_id).label("user_id"),
+            literal(0.0).label("credit"),
+            col(Transaction.amount).label("debt"),
+        )
+        .join(Item, on_item)
+        .where(unpaid, col(Item.flat_id).is_not(None)),
+    ).subquery()
+    statement = select(
+        entries.c.flat_id,
+        entries.c.user_id,
+        func.sum(entries.c.credit),
+        func.sum(entries.c.debt),
+    ).group_by(entries.c.flat_id, entries.c.user_id)
+    return {
+        (flat_id, user_id): (credit, debt)
+        for flat_id, user_id, credit, debt in session.exec(statement)
+    }
+
+
+def expected_pairs(session: Session) -> dict[tuple[int, int], float]:
+    """Amount owed for every (creditor, debtor) pair, summed from the unpaid transactions."""
+    statement = (
+        select(
+            Transaction.creditor_id, Transaction.debtor_id, func.sum(Transaction.amount)
+        )
+        .where(col(Transaction.paid) == False)  # noqa: E712
+        .group_by(col(Transaction.creditor_id), col(Transaction.debtor_id))
+    )
+    return {
+        (creditor_id, debtor_id): amount
+        for creditor_id, debtor_id, amount in session.exec(statement)
+    }
+
+
+def _drift(
+    table: str, stored: dict, expected: dict, zero: tuple[float, ...]
+) -> list[dict]:
+    differences = []
+    for key in sorted(stored.keys() | expected.keys()):
+        stored_values = stored.get(key, zero)
+        expected_values = expected.get(key, zero)
+        if any(abs(a - b) > TOLERANCE for a, b in zip(stored_values, expected_values)):
+            differences.append(
+                {
+                    "table": table,
+                    "key": key,
+                    "stored": stored_values,
+                    "expected": expected_values,
+                }
+            )
+    return differences
+
+
+def check_balances(session: Session) -> list[dict]:
+    """Differences between the stored balances and the ones rebuilt from the ledger."""
+    balances = {
+        (balance.flat_id, balance.user_id): (balance.credit, balance.debt)
+        for balance in session.exec(select(Balance))
+    }
+    pairs = {
+        (pair.creditor_id, pair.debtor_id): (pair.amount,)
+        for pair in session.exec(select(PairBalance))
+    }
+    expected_pair_amounts = {
+        key: (amount,) for key, amount in expected_pairs(session).items()
+    }
+    return _drift("balance", balances, expected_balances(session), (0.0, 0.0)) + _drift(
+        "pairbalance", pairs, expected_pair_amounts, (0.0,)
+    )
+
+
+def rebuild_balances(session: Session):
+    """Replaces the stored balances with the ones rebuilt from the ledger. The caller commits."""
+    balances = expected_balances(session)
+    pairs = expected_pairs(session)
+    session.execute(delete(Balance))
+    session.execute(delete(PairBalance))
+    if balances:
+        session.execute(
+            insert(Balance),
+            [
+                {"flat_id": flat_id, "user_id": user_id, "credit": credit, "debt": debt}
+                for (flat_id, user_id), (credit, debt) in balances.items()
+            ],
+        )
+    if pairs:
+        session.execute(
+            insert(PairBalance),
+            [
+                {"creditor_id": creditor_id, "debtor_id": debtor_id, "amount": amount}
+                for (creditor_id, debtor_id), amount in pairs.items()
+            ],
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.utils import engine
+
+    parser = argparse.ArgumentParser(description="Check the materialized balances")
+    parser.add_argument("--fix", action="store_true")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        differences = check_balances(session)
+        for difference in differences:
+            print(difference)
+        print(f"{len(differences)} differences")
+        if differences and args.fix:
+            rebuild_balances(session)
+            session.commit()
+            print("Balances rebuilt")
@@ -0,0 +1,168 @@
+"""Runs an ordered list of item and move operations on one flat, in a single database transaction.
+
+Each operation has the checks of `src.checks` and the amounts of its endpoint. The items of the flat
+with their owners and the users named by the operations are loaded up front, in the same few statements
+whatever the number of operations, and shared by every operation. Writes stay pending in the session
+and are flushed only when the next operation has to read them back from the database: before a move,
+which reads the ownership table, and before buying into or out of an item added earlier in the batch,
+which needs its id. The caller commits once, and the first failing operation rolls the whole batch
+back."""
+
+from collections.abc import Sequence
+
+from fastapi.exceptions import HTTPException
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, col, select
+
+from src import checks, ledger
+from src.buy_in import item_buy_in
+from src.buy_out import item_buy_out
+from src.models import (
+    BatchAddItem,
+    BatchItemUser,
+    BatchMoveIn,
+    BatchMoveOut,
+    BatchOperation,
+    BatchResult,
+    Flat,
+    Item,
+    User,
+)
+
+
+class Batch:
+    def __init__(
+        self, session: Session, flat: Flat, operations: Sequence[BatchOperation]
+    ):
+        self.session = session
+        self.flat = flat
+        self.operations = operations
+        self.flushes = 0
+        self.items: dict[int, Item] = {
+            item.id: item
+            for item in session.exec(
+                select(Item)
+                .where(Item.flat_id == flat.id)
+                .options(selectinload(Item.users))  # type: ignore
+            )
+            if item.id is not None
+        }
+        self.refs: dict[str, Item] = {}
+        self.added: list[Item] = []
+        user_ids = {
+            operation.user_id
+            for operation in operations
+            if not isinstance(operation, BatchAddItem)
+        }
+        self.users: dict[int, User] = {
+            user.id: user
+            for user in session.exec(select(User).where(col(User.id).in_(user_ids)))
+            if user.id is not None
+        }
+
+    def flush(self):
+        if self.session.new or self.session.dirty or self.session.deleted:
+            self.session.flush()
+            self.flushes += 1
+
+    def item(self, item_id: int | str) -> Item:
+        """An item of the flat, by id or by the ref of an item added earlier in the batch."""
+        if isinstance(item_id, str):
+            item = self.refs.get(item_id)
+        else:
+            item = self.items.get(item_id)
+            if item is None:
+                checks.check_item_in_flat(self.session.get(Item, item_id), self.flat.id)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        if item.id is None:
+            self.flush()
+        return item
+
+    def user(self, user_id: int) -> User:
+        user = self.users.get(user_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    def add_item(self, operation: BatchAddItem) -> BatchResult:
+        if operation.ref is not None and operation.ref in self.refs:
+            raise HTTPException(status_code=400, detail="Item ref is already used")
+        item = Item.model_validate(operation.model_dump(exclude={"op", "ref"}))
+        item.flat_id = self.flat.id
+        item.users = list(self.flat.users)
+        self.session.add(item)
+        if operation.ref is not None:
+            self.refs[operation.ref] = item
+        self.added.append(item)
+        return BatchResult(op=operation.op)
+
+    def add_user_to_item(self, operation: BatchItemUser) -> BatchResult:
+        item = self.item(operation.item_id)
+        user = self.user(operation.user_id)
+        checks.check_can_buy_in(user, item)
+        owners = len(item.users)
+        item_buy_in(self.session, user, item, operation.date)
+        item.users.append(user)
+        return BatchResult(
+            op=operation.op, item_id=item.id, user_id=user.id, transactions=owners
+        )
+
+    def remove_user_from_item(self, operation: BatchItemUser) -> BatchResult:
+        item = self.item(operation.item_id)
+        user = self.user(operation.user_id)
+        checks.check_can_buy_out(user, item)
+        owners = len(item.users)
+        item_buy_out(self.session, user, item, operation.date)
+        item.users.remove(user)
+        return BatchResult(
+            op=operation.op, item_id=item.id, user_id=user.id, transactions=owners - 1
+        )
+
+    def move_in(self, operation: BatchMoveIn) -> BatchResult:
+        user = self.user(operation.user_id)
+        checks.check_can_move_in(user)
+        exclude_items = [
+            self.item(item_id).id or 0 for item_id in operation.exclude_items
+        ]
+        self.flat.users.append(user)
+        self.flush()
+        rows = ledger.move_in(
+            self.session, self.flat, user, operation.date, exclude_items
+        )
+        self._expire_owners()
+        return BatchResult(op=operation.op, user_id=user.id, transactions=len(rows))
+
+    def move_out(self, operation: BatchMoveOut) -> BatchResult:
+        user = self.user(operation.user_id)
+        checks.check_can_move_out(self.flat, user)
+        self.flush()
+        rows = ledger.move_out(self.session, self.flat, user, operation.date)
+        self.flat.users.remove(user)
+        self._expire_owners()
+        return BatchResult(op=operation.op, user_id=user.id, transactions=len(rows))
+
+    def _expire_owners(self):
+        """Moves write the ownership table directly, so the loaded owners have to be reloaded."""
+        for item in [*self.items.values(), *self.added]:
+            self.session.expire(item, ["users"])
+
+    def run(self) -> list[BatchResult]:
+        results: list[BatchResult] = []
+        with self.session.no_autoflush:
+            for index, operation in enumerate(self.operations):
+                try:
+                    results.append(getattr(self, operation.op)(operation))
+                except HTTPException as exception:
+                    self.session.rollback()
+                    raise HTTPException(
+                        status_code=exception.status_code,
+                        detail={"operation": index, "detail": exception.detail},
+                    ) from exception
+        self.flush()
+        # Ids of the added items are only known now
+        added = iter(self.added)
+        for operation, result in zip(self.operations, results):
+            if isinstance(operation, BatchAddItem):
+                result.item_id = next(added).id
+        return results
@@ -2,6 +2,7 @@ from datetime import date
 from fastapi.exceptions import HTTPException
 from sqlmodel import Session
 
+from src.balances import apply_transactions, transaction_row
 from src.depreciation import depreciate_price
 from src.models import (
     Item,
@@ -10,19 +11,30 @@ from src.models import Transaction
 from src.models import User
 
 
-def item_buy_in(session: Session, new_user: User, item: Item, date: date):
+def buy_in_amount(depreciated_price: float, owners: int) -> float:
+    """Amount owed by a new owner to each of the `owners` existing owners of an item."""
+    return (depreciated_price / owners) - (depreciated_price / (owners + 1))
+
+
+def item_buy_in(
+    session: Session,
+    new_user: User,
+    item: Item,
+    date: date,
+    depreciated_price: float | None = None,
+):
     if len(item.users) == 0:
         raise HTTPException(
             status_code=500, detail="Item should have at least one user"
         )
-    depreciated_price = depreciate_price(item, date)
-    calculated_amount = (depreciated_price / len(item.users)) - (
-        depreciated_price / (len(item.users) + 1)
-    )
+    if depreciated_price is None:
+        depreciated_price = depreciate_price(item, date)
+    calculated_amount = buy_in_amount(depreciated_price, len(item.users))
     if item.id is None:
         raise HTTPException(status_code=404, detail="Item needs to have a defined id")
     if new_user.id is None:
         raise HTTPException(status_code=404, detail="User needs to have a defined id")
+    rows = []
     for existing_user in item.users:
         if existing_user.id is None:
             raise HTTPException(
@@ -36,3 +48,5 @@ def item_buy_in(session: Session, new_user: User, item: Item, date: date):
             paid=False,
         )
         session.add(new_transaction)
+        rows.append(transaction_row(new_transaction))
+    apply_transactions(session, rows)
@@ -2,6 +2,7 @@ from datetime import date
 from fastapi.exceptions import HTTPException
 from sqlmodel import Session
 
+from src.balances import apply_transactions, transaction_row
 from src.depreciation import depreciate_price
 from src.models import (
     Item,
@@ -10,19 +11,32 @@ from src.models import Transaction
 from src.models import User
 
 
-def item_buy_out(session: Session, user_to_remove: User, item: Item, date: date):
+def buy_out_amount(depreciated_price: float, owners: int) -> float:
+    """Amount owed to a leaving owner by each of the other `owners - 1` owners of an item."""
+    leaving_user_share = depreciated_price / owners
+    return leaving_user_share / (owners - 1)
+
+
+def item_buy_out(
+    session: Session,
+    user_to_remove: User,
+    item: Item,
+    date: date,
+    depreciated_price: float | None = None,
+):
     if len(item.users) <= 1:
         raise HTTPException(
             status_code=500, detail="Item should have at least one user"
         )
-    depreciated_price = depreciate_price(item, date)
-    leaving_user_share = depreciated_price / len(item.users)
-    buyout_amount = leaving_user_share / (len(item.users) - 1)
+    if depreciated_price is None:
+        depreciated_price = depreciate_price(item, date)
+    buyout_amount = buy_out_amount(depreciated_price, len(item.users))
     if item.id is None:
         raise HTTPException(status_code=404, detail="Item needs to have a defined id")
     if user_to_remove.id is None:
         raise HTTPException(status_code=404, detail="User needs to have a defined id")
 
+    rows = []
     for existing_user in item.users:
         if existing_user.id == user_to_remove.id:
             continue
@@ -38,3 +52,5 @@ def item_buy_out(session: Session, user_to_remove: User, item: Item, date: date)
             paid=False,
         )
         session.add(new_transaction)
+        rows.append(transaction_row(new_transaction))
+    apply_transactions(session, rows)
@@ -0,0 +1,58 @@
+"""Preconditions of the item and move operations, shared by their endpoints, quotes and batches so that
+all of them refuse the same requests with the same errors."""
+
+from collections.abc import Iterable
+
+from fastapi.exceptions import HTTPException
+from sqlmodel import Session, col, select
+
+from src.errors import unauthorized_error
+from src.models import Flat, Item, User
+
+
+def check_item_in_flat(item: Item | None, flat_id: int | None) -> Item:
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if item.flat_id != flat_id:
+        raise unauthorized_error
+    return item
+
+
+def check_items_in_flat(session: Session, flat_id: int, item_ids: Iterable[int]):
+    item_ids = set(item_ids)
+    if not item_ids:
+        return
+    items = {
+        item.id: item
+        for item in session.exec(select(Item).where(col(Item.id).in_(item_ids)))
+    }
+    for item_id in sorted(item_ids):
+        check_item_in_flat(items.get(item_id), flat_id)
+
+
+def check_can_buy_in(user: User, item: Item):
+    if user in item.users:
+        raise HTTPException(status_code=409, detail="User is already assigned to item")
+
+
+def check_can_buy_out(user: User, item: Item):
+    if user not in item.users:
+        raise HTTPException(status_code=404, detail="User was not item owner")
+
+
+def check_can_move_in(user: User):
+    if user.flat_id is not None:
+        raise HTTPException(status_code=400, detail="User already in a flat")
+
+
+def check_in_flat(user: User, flat_id: int | None):
+    if user.flat_id is None:
+        raise HTTPException(status_code=400, detail="User has no flat")
+    if user.flat_id != flat_id:
+        raise HTTPException(status_code=400, detail="User not in flat")
+
+
+def check_can_move_out(flat: Flat, user: User):
+    if len(flat.users) == 1:
+        raise HTTPException(status_code=404, detail="User is the last user in the flat")
+    check_in_flat(user, flat.id)
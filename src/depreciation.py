@@ -1,6 +1,9 @@
+from collections.abc import Sequence
 from datetime import date
 
+import numpy as np
 from fastapi.exceptions import HTTPException
+from numpy.typing import ArrayLike
 
 from src.models import Item
 
@@ -27,3 +30,63 @@ def depreciate_price(item: Item, date_for_calculation: date) -> float:
         depreciated_price = item.initial_value * item.minimum_value_pct
 
     return depreciated_price
+
+
+def depreciate_prices(
+    initial_value: ArrayLike,
+    purchase_date: ArrayLike,
+    yearly_depreciation: ArrayLike,
+    minimum_value: ArrayLike,
+    minimum_value_pct: ArrayLike,
+    dates: ArrayLike,
+    before_purchase: float | None = None,
+) -> np.ndarray:
+    """Vectorized version of `depreciate_price`.
+
+    Every item argument is a column with one entry per item, missing floors are given as None.
+    Returns an array of shape (items, dates) with the depreciated price of every item at every date.
+    Dates before the purchase of an item are an error, unless `before_purchase` gives their price.
+    """
+
+    initial = np.asarray(initial_value, dtype=np.float64)
+    purchased = np.asarray(purchase_date, dtype="datetime64[D]")
+    yearly = np.asarray(yearly_depreciation, dtype=np.float64)
+    # None becomes NaN, and every comparison against NaN is False, so missing floors never apply.
+    floor = np.asarray(minimum_value, dtype=np.float64)
+    floor_pct = np.asarray(minimum_value_pct, dtype=np.float64)
+    when = np.asarray(dates, dtype="datetime64[D]")
+
+    days_passed = (when[np.newaxis, :] - purchased[:, np.newaxis]).astype(np.int64)
+    not_bought = days_passed < 0
+    if not_bought.any():
+        if before_purchase is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Date of depreciation cannot be before date of purchase",
+            )
+        days_passed = np.maximum(days_passed, 0)
+
+    depreciation_factor = (1 - yearly[:, np.newaxis]) ** (days_passed / 365)
+    depreciated = initial[:, np.newaxis] * depreciation_factor
+    depreciated = np.where(
+        depreciated < floor[:, np.newaxis], floor[:, np.newaxis], depreciated
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        below_pct = depreciated / initial[:, np.newaxis] < floor_pct[:, np.newaxis]
+    depreciated = np.where(below_pct, (initial * floor_pct)[:, np.newaxis], depreciated)
+    if before_purchase is not None:
+        depreciated = np.where(not_bought, before_purchase, depreciated)
+    return depreciated
+
+
+def depreciate_items(items: Sequence[Item], dates: Sequence[date]) -> np.ndarray:
+    """Runs `depreciate_prices` over the columns of a list of items."""
+
+    return depreciate_prices(
+        [item.initial_value for item in items],
+        [item.purchase_date for item in items],
+        [item.yearly_depreciation for item in items],
+        [item.minimum_value for item in items],
+        [item.minimum_value_pct for item in items],
+        dates,
+    )
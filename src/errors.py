@@ -2,3 +2,9 @@ from fastapi.exceptions import HTTPException
 
 
 unauthorized_error = HTTPException(status_code=401, detail="Unauthorized")
+
+hashing_overloaded_error = HTTPException(
+    status_code=503,
+    detail="Too many concurrent password operations",
+    headers={"Retry-After": "1"},
+)
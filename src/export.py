@@ -0,0 +1,120 @@
+"""Streams the full ledger of a flat as CSV or NDJSON.
+
+Rows are read through a server-side cursor `EXPORT_CHUNK_SIZE` at a time and each chunk is encoded and
+sent before the next one is fetched, so memory use does not depend on the size of the ledger."""
+
+import csv
+import io
+import json
+import os
+from collections.abc import Iterator, Sequence
+from typing import Any, Literal
+
+from sqlalchemy import Row
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, col, select
+
+from src.models import Item, Transaction, User
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+COLUMNS = [
+    "id",
+    "created_at",
+    "item_id",
+    "item_name",
+    "creditor_id",
+    "creditor_name",
+    "debtor_id",
+    "debtor_name",
+    "amount",
+    "paid",
+]
+
+
+def ledger_statement(flat_id: int):
+    creditor = aliased(User)
+    debtor = aliased(User)
+    return (
+        select(
+            Transaction.id,
+            Transaction.created_at,
+            Transaction.item_id,
+            Item.name,
+            Transaction.creditor_id,
+            creditor.first_name,
+            creditor.last_name,
+            Transaction.debtor_id,
+            debtor.first_name,
+            debtor.last_name,
+            Transaction.amount,
+            Transaction.paid,
+        )
+        .join(Item, col(Item.id) == Transaction.item_id)
+        .join(creditor, col(creditor.id) == Transaction.creditor_id)
+        .join(debtor, col(debtor.id) == Transaction.debtor_id)
+        .where(Item.flat_id == flat_id)
+        .order_by(col(Transaction.created_at), col(Transaction.id))
+    )
+
+
+def _record(row: Row) -> list[Any]:
+    (
+        id,
+        created_at,
+        item_id,
+        item_name,
+        creditor_id,
+        creditor_first_name,
+        creditor_last_name,
+        debtor_id,
+        debtor_first_name,
+        debtor_last_name,
+        amount,
+        paid,
+    ) = row
+    return [
+        id,
+        created_at.isoformat(),
+        item_id,
+        item_name,
+        creditor_id,
+        f"{creditor_first_name} {creditor_last_name}",
+        debtor_id,
+        f"{debtor_first_name} {debtor_last_name}",
+        amount,
+        paid,
+    ]
+
+
+def _encode_csv(rows: Sequence[Sequence[Any]]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _encode_ndjson(rows: Sequence[Sequence[Any]]) -> str:
+    return "".join(json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in rows)
+
+
+def stream_ledger(
+    session: Session, flat_id: int, format: Literal["csv", "ndjson"]
+) -> Iterator[str]:
+    """Yields the encoded ledger of a flat one chunk at a time.
+
+    The response body is sent after the endpoint's dependencies have exited, so the generator closes
+    the session itself once the last chunk is out."""
+    encode = _encode_csv if format == "csv" else _encode_ndjson
+    try:
+        if format == "csv":
+            yield encode([COLUMNS])
+        result = session.execute(
+            ledger_statement(flat_id),
+            execution_options={"yield_per": EXPORT_CHUNK_SIZE},
+        )
+        for rows in result.partitions():
+            yield encode([_record(row) for row in rows])
+    finally:
+        session.close()
@@ -0,0 +1,53 @@
+"""Forecasts what every member of a flat would be paid for moving out at each coming month-end.
+
+A leaving owner gets `price / owners` for each item they share, the sum of the `item_buy_out` amounts
+paid by the other owners, so the whole users × dates matrix is a single product between the members'
+shares of the items and the prices of every item at every date. Items owned by one member alone cannot
+be bought out and count for nothing, as does every item at the dates before its purchase."""
+
+from datetime import date
+
+import numpy as np
+from sqlmodel import Session, col, select
+
+from src.depreciation import depreciate_prices
+from src.models import BuyOutForecast, User
+from src.valuation import load_flat_items
+
+
+def month_ends(start: date, months: int) -> np.ndarray:
+    """The last days of the first `months` months that end after `start`."""
+    first = np.datetime64(start, "M")
+    ends = np.arange(
+        first + 1, first + months + 2, dtype="datetime64[M]"
+    ) - np.timedelta64(1, "D")
+    ends = ends[ends > np.datetime64(start, "D")]
+    return ends[:months]
+
+
+def forecast_buy_outs(
+    session: Session, flat_id: int, start: date, years: int
+) -> BuyOutForecast:
+    dates = month_ends(start, 12 * years)
+    user_ids = session.exec(
+        select(User.id).where(User.flat_id == flat_id).order_by(col(User.id))
+    ).all()
+    totals = np.zeros((len(user_ids), len(dates)))
+    items = load_flat_items(session, flat_id)
+    if items is not None and user_ids:
+        rows = {user_id: row for row, user_id in enumerate(user_ids)}
+        shares = np.zeros((len(user_ids), len(items.ids)))
+        for column, owners in enumerate(items.owners):
+            if len(owners) > 1:
+                for owner_id in owners:
+                    if owner_id in rows:
+                        shares[rows[owner_id], column] = 1 / len(owners)
+        totals = shares @ depreciate_prices(
+            *items.depreciation_fields, dates, before_purchase=0.0
+        )
+    return BuyOutForecast(
+        flat_id=flat_id,
+        user_ids=list(user_ids),
+        dates=dates.astype(date).tolist(),
+        totals=np.round(totals, 2).tolist(),
+    )
@@ -0,0 +1,146 @@
+"""Async client for the Google OAuth flow.
+
+All calls share one pooled `httpx.AsyncClient`. Google's ID token signing certs are cached for as long as
+their `Cache-Control`/`Expires` headers allow, and refetched early when a token is signed with an
+unknown key, at most once every `GOOGLE_CERTS_MIN_REFRESH` seconds. Every URL can be pointed at a local
+stub server through environment variables."""
+
+import asyncio
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+import jwt
+from fastapi import status
+from fastapi.exceptions import HTTPException
+from google.auth import jwt as google_jwt
+
+GOOGLE_AUTH_URL = os.getenv(
+    "GOOGLE_AUTH_URL", "https://accounts.google.com/o/oauth2/auth"
+)
+GOOGLE_TOKEN_URL = os.getenv(
+    "GOOGLE_TOKEN_URL", "https://accounts.google.com/o/oauth2/token"
+)
+GOOGLE_USERINFO_URL = os.getenv(
+    "GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v3/userinfo"
+)
+GOOGLE_CERTS_URL = os.getenv(
+    "GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs"
+)
+GOOGLE_HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "10"))
+GOOGLE_HTTP_MAX_CONNECTIONS = int(os.getenv("GOOGLE_HTTP_MAX_CONNECTIONS", "20"))
+GOOGLE_CERTS_MIN_REFRESH = float(os.getenv("GOOGLE_CERTS_MIN_REFRESH", "60"))
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=GOOGLE_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=GOOGLE_HTTP_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def cache_lifetime(headers: httpx.Headers) -> float:
+    """Seconds a response may be cached for, from its `Cache-Control` or `Expires` header."""
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name.lower() == "max-age" and value.isdigit():
+            age = headers.get("age", "0")
+            return max(0.0, float(value) - (float(age) if age.isdigit() else 0.0))
+    expires = headers.get("expires")
+    if expires:
+        try:
+            return max(0.0, parsedate_to_datetime(expires).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0.0
+    return 0.0
+
+
+class CertCache:
+    def __init__(self, url: str, min_refresh: float = GOOGLE_CERTS_MIN_REFRESH):
+        self.url = url
+        self.min_refresh = min_refresh
+        self.certs: dict[str, str] = {}
+        self.expires_at = 0.0
+        # Last refetch forced by an unknown key
+        self.refreshed_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def _usable(self, key_id: str | None) -> bool:
+        if not self.certs or time.monotonic() >= self.expires_at:
+            return False
+        if key_id is None or key_id in self.certs:
+            return True
+        # Unknown keys only force a refetch once in a while, so bogus tokens cannot flood Google
+        return (
+            self.refreshed_at is not None
+            and time.monotonic() - self.refreshed_at < self.min_refresh
+        )
+
+    async def get(self, key_id: str | None = None) -> dict[str, str]:
+        """The signing certs, refetched early when they lack `key_id`."""
+        if (
+            self.certs
+            and time.monotonic() < self.expires_at
+            and (key_id is None or key_id in self.certs)
+        ):
+            return self.certs
+        async with self._lock:
+            # Another request may have refreshed the certs while this one waited
+            if self._usable(key_id):
+                return self.certs
+            forced = bool(self.certs) and time.monotonic() < self.expires_at
+            response = await get_client().get(self.url)
+            response.raise_for_status()
+            self.certs = response.json()
+            now = time.monotonic()
+            self.expires_at = now + cache_lifetime(response.headers)
+            if forced:
+                self.refreshed_at = now
+            return self.certs
+
+
+cert_cache = CertCache(GOOGLE_CERTS_URL)
+
+
+async def exchange_code(data: dict[str, Any]) -> dict[str, Any]:
+    response = await get_client().post(GOOGLE_TOKEN_URL, data=data)
+    response.raise_for_status()
+    return response.json()
+
+
+async def fetch_userinfo(access_token: str) -> dict[str, Any]:
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = await get_client().get(GOOGLE_USERINFO_URL, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+async def verify_id_token(token: str, audience: str | None) -> dict[str, Any]:
+    try:
+        key_id = jwt.get_unverified_header(token).get("kid")
+    except jwt.InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Google ID token."
+        )
+    # Refetched when Google rotated its keys before our cached copy expired
+    certs = await cert_cache.get(key_id)
+    try:
+        return google_jwt.decode(token, certs=certs, audience=audience)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Google ID token."
+        )
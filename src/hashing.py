@@ -0,0 +1,58 @@
+"""Password hashing on a dedicated, size-limited worker pool.
+
+bcrypt is deliberately slow, so it never runs on the event loop. At most `HASH_WORKERS` hashes run at once
+and at most `HASH_QUEUE_LIMIT` more wait for a worker, further requests are rejected with a 503."""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+import bcrypt
+
+from src.errors import hashing_overloaded_error
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+
+def _bcrypt_hash(password: str) -> str:
+    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+    return hashed_pw.decode()
+
+
+def _bcrypt_check(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed_password.encode())
+
+
+def _submit(fn: Callable[..., T], *args) -> Future[T]:
+    if not _slots.acquire(blocking=False):
+        raise hashing_overloaded_error
+    future = _executor.submit(fn, *args)
+    future.add_done_callback(lambda _future: _slots.release())
+    return future
+
+
+def hash_password(password: str) -> str:
+    """Hashes on the worker pool and blocks until done, for sync handlers."""
+    return _submit(_bcrypt_hash, password).result()
+
+
+def check_hash(password: str, hashed_password: str) -> bool:
+    """Checks on the worker pool and blocks until done, for sync handlers."""
+    return _submit(_bcrypt_check, password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(_bcrypt_hash, password))
+
+
+async def check_hash_async(password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_submit(_bcrypt_check, password, hashed_password))
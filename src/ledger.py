@@ -0,0 +1,199 @@
+from collections import defaultdict
+from collections.abc import Sequence
+from datetime import date, datetime, timezone
+
+from fastapi.exceptions import HTTPException
+from sqlalchemy import ColumnElement, delete, insert, update
+from sqlmodel import Session, col, select
+
+from src.balances import apply_transactions
+from src.buy_in import buy_in_amount
+from src.buy_out import buy_out_amount
+from src.models import Flat, Item, Transaction, User, UserItems
+from src.schedules import depreciation_schedules
+
+
+def load_owners(session: Session, flat_id: int) -> dict[int, list[int]]:
+    """Maps every item of a flat to the ids of its owners, in a single query."""
+    statement = (
+        select(UserItems.item_id, UserItems.user_id)
+        .join(Item, col(Item.id) == UserItems.item_id)
+        .where(Item.flat_id == flat_id)
+    )
+    owners: dict[int, list[int]] = defaultdict(list)
+    for item_id, user_id in session.exec(statement):
+        if item_id is not None and user_id is not None:
+            owners[item_id].append(user_id)
+    return owners
+
+
+def buy_in_rows(
+    new_user_id: int,
+    items: Sequence[Item],
+    owners: dict[int, list[int]],
+    date: date,
+) -> list[dict]:
+    """Transaction rows for `new_user_id` buying into every item, same amounts as `item_buy_in`."""
+    if not items:
+        return []
+    prices = depreciation_schedules.prices(items, date)
+    rows = []
+    for item, price in zip(items, prices):
+        if item.id is None:
+            raise HTTPException(
+                status_code=404, detail="Item needs to have a defined id"
+            )
+        item_owners = owners.get(item.id, [])
+        if len(item_owners) == 0:
+            raise HTTPException(
+                status_code=500, detail="Item should have at least one user"
+            )
+        amount = buy_in_amount(price, len(item_owners))
+        for owner_id in item_owners:
+            rows.append(
+                {
+                    "creditor_id": owner_id,
+                    "debtor_id": new_user_id,
+                    "item_id": item.id,
+                    "amount": amount,
+                    "paid": False,
+                }
+            )
+    return rows
+
+
+def buy_out_rows(
+    leaving_user_id: int,
+    items: Sequence[Item],
+    owners: dict[int, list[int]],
+    date: date,
+) -> list[dict]:
+    """Transaction rows for `leaving_user_id` selling out of every item, same amounts as `item_buy_out`."""
+    if not items:
+        return []
+    prices = depreciation_schedules.prices(items, date)
+    rows = []
+    for item, price in zip(items, prices):
+        if item.id is None:
+            raise HTTPException(
+                status_code=404, detail="Item needs to have a defined id"
+            )
+        item_owners = owners.get(item.id, [])
+        if len(item_owners) <= 1:
+            raise HTTPException(
+                status_code=500, detail="Item should have at least one user"
+            )
+        amount = buy_out_amount(price, len(item_owners))
+        for owner_id in item_owners:
+            if owner_id == leaving_user_id:
+                continue
+            rows.append(
+                {
+                    "creditor_id": leaving_user_id,
+                    "debtor_id": owner_id,
+                    "item_id": item.id,
+                    "amount": amount,
+                    "paid": False,
+                }
+            )
+    return rows
+
+
+def write_transactions(session: Session, rows: list[dict]):
+    """Writes transaction rows with a single multi-row insert and adds them to the balances."""
+    if rows:
+        session.execute(insert(Transaction), rows)
+        apply_transactions(session, rows)
+
+
+def set_paid(
+    session: Session, paid: bool, *conditions: ColumnElement[bool]
+) -> list[dict]:
+    """Sets `paid` on every transaction matching `conditions` with a single `UPDATE`.
+
+    Only transactions whose flag changes are updated. They are moved in or out of the balances and
+    returned. Dialects without `UPDATE ... RETURNING` (SQLite before 3.35, MySQL) select and lock the
+    transactions first."""
+    conditions = (col(Transaction.paid) == (not paid), *conditions)
+    columns = (
+        col(Transaction.creditor_id),
+        col(Transaction.debtor_id),
+        col(Transaction.item_id),
+        col(Transaction.amount),
+    )
+    statement = (
+        update(Transaction)
+        .where(*conditions)
+        .values(paid=paid, updated_at=datetime.now(timezone.utc))
+    )
+    options = {"synchronize_session": False}
+    if session.get_bind().dialect.update_returning:
+        result = session.execute(
+            statement.returning(*columns), execution_options=options
+        )
+        rows = [dict(row._mapping) for row in result]
+    else:
+        selected = select(*columns).where(*conditions).with_for_update()
+        rows = [dict(row._mapping) for row in session.execute(selected)]
+        session.execute(statement, execution_options=options)
+    apply_transactions(session, rows, sign=-1 if paid else 1)
+    return rows
+
+
+def move_in_rows(
+    session: Session, flat_id: int, user_id: int, date: date, exclude_items: list[int]
+) -> tuple[Sequence[Item], list[dict]]:
+    """The items a user moving into a flat buys into, and the buy-in transaction rows. Writes nothing."""
+    items = session.exec(
+        select(Item).where(Item.flat_id == flat_id, col(Item.id).not_in(exclude_items))
+    ).all()
+    owners = load_owners(session, flat_id)
+    return items, buy_in_rows(user_id, items, owners, date)
+
+
+def move_out_rows(
+    session: Session, flat_id: int, user_id: int, date: date
+) -> tuple[Sequence[Item], list[dict]]:
+    """The items a user leaving a flat sells out of, and the buy-out transaction rows. Writes nothing."""
+    owners = load_owners(session, flat_id)
+    owned_ids = [item_id for item_id, users in owners.items() if user_id in users]
+    items = (
+        session.exec(select(Item).where(col(Item.id).in_(owned_ids))).all()
+        if owned_ids
+        else []
+    )
+    return items, buy_out_rows(user_id, items, owners, date)
+
+
+def move_in(
+    session: Session, flat: Flat, user: User, date: date, exclude_items: list[int]
+) -> list[dict]:
+    """Creates every buy-in transaction and item ownership for a user moving into a flat.
+
+    The flat membership itself is left to the caller."""
+    if flat.id is None:
+        raise HTTPException(status_code=404, detail="Flat needs to have a defined id")
+    if user.id is None:
+        raise HTTPException(status_code=404, detail="User needs to have a defined id")
+    items, rows = move_in_rows(session, flat.id, user.id, date, exclude_items)
+    write_transactions(session, rows)
+    if items:
+        session.execute(
+            insert(UserItems),
+            [{"user_id": user.id, "item_id": item.id} for item in items],
+        )
+    return rows
+
+
+def move_out(session: Session, flat: Flat, user: User, date: date) -> list[dict]:
+    """Creates every buy-out transaction for a user leaving a flat and drops their item ownership.
+
+    The flat membership itself is left to the caller."""
+    if flat.id is None:
+        raise HTTPException(status_code=404, detail="Flat needs to have a defined id")
+    if user.id is None:
+        raise HTTPException(status_code=404, detail="User needs to have a defined id")
+    _, rows = move_out_rows(session, flat.id, user.id, date)
+    write_transactions(session, rows)
+    session.execute(delete(UserItems).where(col(UserItems.user_id) == user.id))
+    return rows
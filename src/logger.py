@@ -1,16 +1,109 @@
+"""Application logging through a background writer.
+
+Records are put on a bounded queue by a `QueueHandler` and written by a `QueueListener` thread, so
+logging never blocks the event loop on disk. The app starts the writer in its lifespan, so importing this
+module starts no thread and opens no file. A single process writes the rotating `app.log`. As soon as
+several workers may run, each writes its own `app.<pid>.log` instead, since processes sharing one file
+interleave their lines and rotate it under each other: when `WEB_CONCURRENCY` is above 1, in a worker
+spawned by a parent process (uvicorn `--workers`), and in a forked child. `LOG_PER_WORKER=true` or
+`false` forces the choice, except that a forked child never shares the file of its parent. Records that
+do not fit in the queue are dropped and counted rather than blocking the request."""
+
+import atexit
 import logging
+import multiprocessing
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_PER_WORKER = os.getenv("LOG_PER_WORKER")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
 logger = logging.getLogger("fastapi")
 
 
 fmt = logging.Formatter("%(name)s: %(asctime)s | %(levelname)s | %(message)s")
 
-logger.handlers.clear()
 
-file_handler = logging.FileHandler("app.log")
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# Set in children forked after logging started
+_forked = False
+
+
+def per_worker() -> bool:
+    if _forked:
+        return True
+    if LOG_PER_WORKER is not None:
+        return LOG_PER_WORKER.lower() == "true"
+    return (
+        int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+        or multiprocessing.parent_process() is not None
+    )
+
+
+def log_file_name(pid: int) -> str:
+    if not per_worker():
+        return LOG_FILE
+    root, extension = os.path.splitext(LOG_FILE)
+    return f"{root}.{pid}{extension}"
+
+
+queue_handler: DroppingQueueHandler | None = None
+listener: QueueListener | None = None
+
+
+def start_logging():
+    """Points `logger` at a fresh queue and writer thread for the current process."""
+    global queue_handler, listener
+    file_handler = RotatingFileHandler(
+        log_file_name(os.getpid()),
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        delay=True,
+    )
+    file_handler.setFormatter(fmt)
+    queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    listener = QueueListener(queue_handler.queue, file_handler)
+    logger.handlers = [queue_handler]
+    listener.start()
+
+
+def stop_logging():
+    """Writes out the queued records and stops the writer thread."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+
+def dropped_records() -> int:
+    return queue_handler.dropped if queue_handler is not None else 0
+
 
-file_handler.setFormatter(fmt)
+def _restart_in_child():
+    # The writer thread does not survive a fork, and the child needs its own file
+    global _forked
+    if listener is not None:
+        _forked = True
+        start_logging()
 
-logger.handlers = [file_handler]
 
 logger.setLevel(logging.INFO)
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_restart_in_child)
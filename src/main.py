@@ -2,23 +2,33 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from src.middleware import LoggingMiddleware
-from src.routers import flats, items, login, reset, transactions, users
-from src.utils import create_db_and_tables
+from src import google_oauth
+from src.logger import start_logging, stop_logging
+from src.metrics import MetricsMiddleware
+from src.middleware import AccessLogMiddleware
+from src.profiler import QueryProfilerMiddleware
+from src.routers import flats, items, login, metrics, reset, transactions, users
+from src.utils import create_db_and_tables, dispose_async_engine
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     # Startup logic
+    start_logging()
     create_db_and_tables()
     yield
     # Shutdown logic (optional)
+    await google_oauth.close_client()
+    await dispose_async_engine()
+    stop_logging()
 
 
 app = FastAPI(lifespan=lifespan)
 
 
-app.add_middleware(LoggingMiddleware)
+app.add_middleware(AccessLogMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryProfilerMiddleware)
 
 
 app.include_router(users.router)
@@ -27,3 +37,4 @@ app.include_router(items.router)
 app.include_router(transactions.router)
 app.include_router(reset.router)
 app.include_router(login.router)
+app.include_router(metrics.router)
@@ -0,0 +1,152 @@
+"""In-process request metrics in the Prometheus text format.
+
+`MetricsMiddleware` counts requests and records their latency per route template, method and status,
+and tracks the requests in flight. Requests that match no route share the `<unmatched>` route so that
+random paths cannot grow the number of series. Updates happen on the event loop and only touch a few
+dict entries. Connection pool, cache and log queue figures are read when `/metrics` is
+scraped. Every worker process keeps its own metrics, Prometheus adds them up across targets."""
+
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import Engine, QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    def __init__(self):
+        # One count per bucket plus +Inf, made cumulative when rendered
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    def __init__(self):
+        self.requests: dict[tuple[str, str, int], int] = defaultdict(int)
+        self.latencies: dict[tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        self.requests[(method, route, status)] += 1
+        self.latencies[(method, route)].observe(seconds)
+
+    def clear(self):
+        self.requests.clear()
+        self.latencies.clear()
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, registry: Metrics = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.registry.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.registry.in_flight -= 1
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            self.registry.observe(
+                scope["method"], route, status, time.perf_counter() - start
+            )
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: object) -> str:
+    pairs = (f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _header(lines: list[str], name: str, kind: str, help: str):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render(
+    registry: Metrics,
+    engines: dict[str, Engine],
+    cache_stats: dict[str, dict[str, int]],
+    dropped_log_records: int,
+) -> str:
+    lines: list[str] = []
+
+    _header(lines, "http_requests_total", "counter", "Requests by route and status.")
+    for (method, route, status), count in sorted(registry.requests.items()):
+        labels = _labels(method=method, route=route, status=status)
+        lines.append(f"http_requests_total{labels} {count}")
+
+    name = "http_request_duration_seconds"
+    _header(lines, name, "histogram", "Request latency by route.")
+    for (method, route), histogram in sorted(registry.latencies.items()):
+        cumulative = 0
+        for bound, count in zip(
+            (*LATENCY_BUCKETS, "+Inf"), histogram.counts, strict=True
+        ):
+            cumulative += count
+            labels = _labels(method=method, route=route, le=bound)
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _labels(method=method, route=route)
+        lines.append(f"{name}_sum{labels} {histogram.sum}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+
+    _header(lines, "http_requests_in_flight", "gauge", "Requests being served.")
+    lines.append(f"http_requests_in_flight {registry.in_flight}")
+
+    # Only queue pools report their usage, in-memory SQLite pools do not
+    pool_gauges = {
+        "db_pool_size": ("size", "Connections kept in the pool."),
+        "db_pool_checked_out": ("checkedout", "Connections in use."),
+        "db_pool_checked_in": ("checkedin", "Idle connections in the pool."),
+        "db_pool_overflow": ("overflow", "Connections opened beyond the pool size."),
+    }
+    for name, (method, help) in pool_gauges.items():
+        _header(lines, name, "gauge", help)
+        for pool_name, engine in engines.items():
+            if isinstance(engine.pool, QueuePool):
+                value = getattr(engine.pool, method)()
+                lines.append(f"{name}{_labels(pool=pool_name)} {value}")
+
+    for cache, stats in cache_stats.items():
+        for key, kind in (
+            ("hits", "counter"),
+            ("misses", "counter"),
+            ("size", "gauge"),
+        ):
+            name = f"{cache}_cache_{key}" + ("_total" if kind == "counter" else "")
+            _header(lines, name, kind, f"{cache.capitalize()} cache {key}.")
+            lines.append(f"{name} {stats[key]}")
+
+    name = "log_records_dropped_total"
+    _header(lines, name, "counter", "Log records dropped on a full log queue.")
+    lines.append(f"{name} {dropped_log_records}")
+
+    return "\n".join(lines) + "\n"
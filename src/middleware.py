@@ -1,13 +1,75 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
+"""Access log as a plain ASGI middleware.
+
+Unlike `BaseHTTPMiddleware`, it wraps `send` instead of the response, so it adds no task per request
+and streaming responses pass through unbuffered. Requests are logged once the response is sent, with
+the route template (`/users/{user_id}` rather than `/users/3`), the status and the duration.
+
+`LOG_SAMPLE_RATES` keeps a fraction of the records of busy routes, for example
+`GET /users/=0.1,/items/{item_id}=0.5`. Keys are a route template with an optional method, and server
+errors are always logged."""
+
+import json
+import os
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from src.logger import logger
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        log_dict = {"url": request.url.path, "method": request.method}
-        logger.info(log_dict, extra=log_dict)
+def parse_sample_rates(value: str) -> dict[str, float]:
+    rates = {}
+    for entry in value.split(","):
+        if entry.strip():
+            key, _, rate = entry.rpartition("=")
+            rates[key.strip()] = float(rate)
+    return rates
+
+
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+def route_template(scope: Scope) -> str:
+    """The path of the matched route, which the router sets on the scope. Unmatched paths are kept as is."""
+    route = scope.get("route")
+    return getattr(route, "path", scope["path"])
+
+
+class AccessLogMiddleware:
+    def __init__(self, app: ASGIApp, sample_rates: dict[str, float] | None = None):
+        self.app = app
+        self.sample_rates = LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+
+    def sampled(self, method: str, path: str, status: int) -> bool:
+        if status >= 500:
+            return True
+        rate = self.sample_rates.get(f"{method} {path}", self.sample_rates.get(path))
+        return rate is None or random.random() < rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
 
-        response = await call_next(request)
-        return response
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            path = route_template(scope)
+            if self.sampled(scope["method"], path, status):
+                log_dict = {
+                    "url": path,
+                    "method": scope["method"],
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                }
+                logger.info(json.dumps(log_dict), extra=log_dict)
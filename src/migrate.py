@@ -0,0 +1,16 @@
+"""Creates the tables and applies the pending migrations of the database from `DATABASE_URL`.
+
+Kept apart from `src.migrations`, which would define its tables a second time if run as `__main__`."""
+
+import src.models  # noqa: F401  Registers the tables for create_all
+from src.migrations import current_version
+from src.utils import create_db_and_tables, engine
+
+
+def main():
+    create_db_and_tables()
+    print(f"Database at schema version {current_version(engine)}")
+
+
+if __name__ == "__main__":
+    main()
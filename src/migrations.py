@@ -0,0 +1,123 @@
+"""Versioned schema migrations.
+
+`create_all` only creates missing tables, so changes to existing tables are listed in `MIGRATIONS`.
+Applied versions are recorded in the `schema_version` table and every migration runs once, in its own
+transaction. Migrations must be idempotent since a fresh database already has the full schema.
+
+Run with `uv run python -m src.migrate` to migrate the database from `DATABASE_URL`."""
+
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+from sqlalchemy import Connection, Engine, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Field, SQLModel
+
+
+class SchemaVersion(SQLModel, table=True):
+    __tablename__ = "schema_version"  # type: ignore
+
+    version: int = Field(primary_key=True)
+    description: str
+    applied_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def execute(*statements: str) -> Callable[[Connection], None]:
+    """A migration made of plain DDL, written so that it can run again without effect."""
+
+    def migrate(connection: Connection):
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+
+    return migrate
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (
+        1,
+        "Keyset pagination indexes on (created_at, id)",
+        execute(
+            "CREATE INDEX IF NOT EXISTS ix_flat_created_at_id ON flat (created_at, id)",
+            'CREATE INDEX IF NOT EXISTS ix_user_created_at_id ON "user" (created_at, id)',
+            "CREATE INDEX IF NOT EXISTS ix_item_created_at_id ON item (created_at, id)",
+        ),
+    ),
+    (
+        2,
+        "Indexes on transaction, item and membership lookups",
+        execute(
+            "CREATE INDEX IF NOT EXISTS ix_transaction_debtor_id_paid "
+            'ON "transaction" (debtor_id, paid)',
+            "CREATE INDEX IF NOT EXISTS ix_transaction_creditor_id_paid "
+            'ON "transaction" (creditor_id, paid)',
+            'CREATE INDEX IF NOT EXISTS ix_transaction_item_id ON "transaction" (item_id)',
+            "CREATE INDEX IF NOT EXISTS ix_item_flat_id ON item (flat_id)",
+            'CREATE INDEX IF NOT EXISTS ix_user_flat_id ON "user" (flat_id)',
+            "CREATE INDEX IF NOT EXISTS ix_useritems_item_id ON useritems (item_id)",
+        ),
+    ),
+    (
+        3,
+        "Order debts and credits by (created_at, id) within the index",
+        execute(
+            "CREATE INDEX IF NOT EXISTS ix_transaction_debtor_id_paid_created_at_id "
+            'ON "transaction" (debtor_id, paid, created_at, id)',
+            "CREATE INDEX IF NOT EXISTS ix_transaction_creditor_id_paid_created_at_id "
+            'ON "transaction" (creditor_id, paid, created_at, id)',
+            "DROP INDEX IF EXISTS ix_transaction_debtor_id_paid",
+            "DROP INDEX IF EXISTS ix_transaction_creditor_id_paid",
+        ),
+    ),
+    (
+        4,
+        "Backfill the materialized balances from the unpaid transactions",
+        execute(
+            "DELETE FROM balance",
+            "INSERT INTO balance (flat_id, user_id, credit, debt) "
+            "SELECT flat_id, user_id, SUM(credit), SUM(debt) FROM ("
+            "SELECT item.flat_id AS flat_id, t.creditor_id AS user_id, "
+            "t.amount AS credit, 0.0 AS debt "
+            'FROM "transaction" AS t JOIN item ON item.id = t.item_id '
+            "WHERE NOT t.paid AND item.flat_id IS NOT NULL "
+            "UNION ALL "
+            "SELECT item.flat_id, t.debtor_id, 0.0, t.amount "
+            'FROM "transaction" AS t JOIN item ON item.id = t.item_id '
+            "WHERE NOT t.paid AND item.flat_id IS NOT NULL"
+            ") AS entries GROUP BY flat_id, user_id",
+            "DELETE FROM pairbalance",
+            "INSERT INTO pairbalance (creditor_id, debtor_id, amount) "
+            'SELECT creditor_id, debtor_id, SUM(amount) FROM "transaction" '
+            "WHERE NOT paid GROUP BY creditor_id, debtor_id",
+        ),
+    ),
+]
+
+
+def current_version(engine: Engine) -> int:
+    with engine.connect() as connection:
+        version = connection.execute(select(func.max(SchemaVersion.version))).scalar()
+    return version or 0
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """Applies every pending migration and returns the versions that were applied."""
+    SchemaVersion.__table__.create(engine, checkfirst=True)  # type: ignore
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version(engine):
+            continue
+        try:
+            with engine.begin() as connection:
+                migrate(connection)
+                connection.execute(
+                    insert(SchemaVersion).values(
+                        version=version,
+                        description=description,
+                        applied_at=datetime.now(timezone.utc),
+                    )
+                )
+        except IntegrityError:
+            # Another worker applied this version first
+            continue
+        applied.append(version)
+    return applied
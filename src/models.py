@@ -1,5 +1,8 @@
 from datetime import date, datetime
+from typing import Annotated, Literal
 
+from pydantic import BaseModel
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from src.timestamps import TimestampMixin
@@ -10,6 +13,8 @@ class FlatBase(TimestampMixin, SQLModel):
 
 
 class Flat(FlatBase, table=True):
+    __table_args__ = (Index("ix_flat_created_at_id", "created_at", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
     users: list["User"] = Relationship(back_populates="flat")
     items: list["Item"] = Relationship(back_populates="flat")
@@ -33,6 +38,9 @@ class FlatUpdate(SQLModel):
 
 
 class UserItems(SQLModel, table=True):
+    # The primary key already covers lookups by user_id
+    __table_args__ = (Index("ix_useritems_item_id", "item_id"),)
+
     user_id: int | None = Field(foreign_key="user.id", primary_key=True)
     item_id: int | None = Field(foreign_key="item.id", primary_key=True)
 
@@ -51,6 +59,11 @@ class UserBase(TimestampMixin, SQLModel):
 
 
 class User(UserBase, table=True):
+    __table_args__ = (
+        Index("ix_user_created_at_id", "created_at", "id"),
+        Index("ix_user_flat_id", "flat_id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     hashed_password: str | None = Field(default=None)
     flat: Flat | None = Relationship(back_populates="users")
@@ -116,6 +129,11 @@ class ItemBase(TimestampMixin, SQLModel):
 
 
 class Item(ItemBase, table=True):
+    __table_args__ = (
+        Index("ix_item_created_at_id", "created_at", "id"),
+        Index("ix_item_flat_id", "flat_id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     flat: Flat = Relationship(back_populates="items")
     users: list[User] = Relationship(back_populates="items", link_model=UserItems)
@@ -166,6 +184,24 @@ class TransactionBase(TimestampMixin, SQLModel):
 
 
 class Transaction(TransactionBase, table=True):
+    __table_args__ = (
+        Index(
+            "ix_transaction_debtor_id_paid_created_at_id",
+            "debtor_id",
+            "paid",
+            "created_at",
+            "id",
+        ),
+        Index(
+            "ix_transaction_creditor_id_paid_created_at_id",
+            "creditor_id",
+            "paid",
+            "created_at",
+            "id",
+        ),
+        Index("ix_transaction_item_id", "item_id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     creditor: User = Relationship(
         back_populates="credits",
@@ -186,6 +222,19 @@ class TransactionUpdate(SQLModel):
     paid: bool
 
 
+class TransactionBulkUpdate(TransactionUpdate):
+    """Selects transactions of the current user by `ids` and/or by filter. `before` is exclusive."""
+
+    ids: list[int] | None = None
+    counterparty_id: int | None = None
+    item_id: int | None = None
+    before: datetime | None = None
+
+
+class TransactionBulkUpdated(SQLModel):
+    updated: int
+
+
 class TransactionPublic(TransactionBase):
     id: int
 
@@ -194,3 +243,148 @@ class TransactionPublicWithUsers(TransactionBase):
     id: int
     creditor: UserPublic
     debtor: UserPublic
+
+
+class Balance(SQLModel, table=True):
+    """Unpaid amounts owed to and by a user within a flat, maintained by `src.balances`."""
+
+    flat_id: int = Field(foreign_key="flat.id", primary_key=True)
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    credit: float = Field(default=0.0)
+    debt: float = Field(default=0.0)
+
+
+class BalancePublic(SQLModel):
+    flat_id: int
+    user_id: int
+    credit: float
+    debt: float
+    net: float
+
+
+class PairBalance(SQLModel, table=True):
+    """Unpaid amount a debtor owes a creditor, maintained by `src.balances`."""
+
+    creditor_id: int = Field(foreign_key="user.id", primary_key=True)
+    debtor_id: int = Field(foreign_key="user.id", primary_key=True)
+    amount: float = Field(default=0.0)
+
+
+class SettlementTransfer(SQLModel):
+    debtor_id: int
+    creditor_id: int
+    amount: float
+
+
+class SettlementPublic(SQLModel):
+    flat_id: int
+    transfers: list[SettlementTransfer] = []
+    settled: int = 0
+
+
+# Plain pydantic models, a valuation can list thousands of items and SQLModel's __init__ is several times
+# slower to validate them
+class ItemValuation(BaseModel):
+    item_id: int
+    name: str
+    value: float
+    owner_ids: list[int] = []
+
+
+class UserShare(BaseModel):
+    user_id: int
+    value: float
+
+
+class FlatValuation(BaseModel):
+    flat_id: int
+    date: date
+    total: float = 0.0
+    items: list[ItemValuation] = []
+    shares: list[UserShare] = []
+
+
+class QuoteItem(BaseModel):
+    item_id: int
+    name: str
+    price: float
+    amount: float
+
+
+class QuoteCounterparty(BaseModel):
+    user_id: int
+    amount: float
+
+
+class MoveQuote(BaseModel):
+    """What a move would cost, paid by the user on a move-in and received on a move-out."""
+
+    kind: Literal["move_in", "move_out"]
+    flat_id: int
+    user_id: int
+    date: date
+    total: float = 0.0
+    items: list[QuoteItem] = []
+    counterparties: list[QuoteCounterparty] = []
+
+
+class BuyOutForecast(BaseModel):
+    """`totals[u][d]` is what user `user_ids[u]` would be paid for moving out on `dates[d]`."""
+
+    flat_id: int
+    user_ids: list[int] = []
+    dates: list[date] = []
+    totals: list[list[float]] = []
+
+
+MAX_BATCH_OPERATIONS = 100
+
+
+class BatchAddItem(ItemCreate):
+    op: Literal["add_item"]
+    # Lets later operations of the batch refer to the new item by this name instead of an id
+    ref: str | None = None
+
+
+class BatchItemUser(SQLModel):
+    op: Literal["add_user_to_item", "remove_user_from_item"]
+    item_id: int | str = Field(schema_extra={"examples": [1, "tv"]})
+    user_id: int
+    date: date
+
+
+class BatchMoveIn(SQLModel):
+    op: Literal["move_in"]
+    user_id: int
+    date: date
+    exclude_items: list[int | str] = []
+
+
+class BatchMoveOut(SQLModel):
+    op: Literal["move_out"]
+    user_id: int
+    date: date
+
+
+BatchOperation = Annotated[
+    BatchAddItem | BatchItemUser | BatchMoveIn | BatchMoveOut,
+    Field(discriminator="op"),
+]
+
+
+class BatchRequest(SQLModel):
+    operations: list[BatchOperation] = Field(
+        min_length=1, max_length=MAX_BATCH_OPERATIONS
+    )
+
+
+class BatchResult(SQLModel):
+    op: str
+    item_id: int | None = None
+    user_id: int | None = None
+    transactions: int = 0
+
+
+class BatchPublic(SQLModel):
+    flat_id: int
+    results: list[BatchResult] = []
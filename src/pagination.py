@@ -0,0 +1,80 @@
+"""Keyset pagination on `(created_at, id)` for the list endpoints.
+
+The cursor of the next page is returned in the `X-Next-Cursor` header, the header is absent on the last page."""
+
+import base64
+import json
+import os
+from datetime import datetime
+from typing import TypeVar
+
+from fastapi import Response
+from fastapi.exceptions import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm.interfaces import ORMOption
+from sqlmodel import Session, SQLModel, col
+from sqlmodel.sql.expression import SelectOfScalar
+
+from src.timestamps import naive_utc
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Model = TypeVar("Model", bound=SQLModel)
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = json.dumps([naive_utc(created_at).isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(
+    session: Session,
+    statement: SelectOfScalar[Model],
+    model: type[Model],
+    response: Response,
+    cursor: str | None,
+    limit: int,
+    plan: list[ORMOption] | None = None,
+    descending: bool = False,
+) -> list[Model]:
+    """Returns the page of `statement` that follows `cursor` and sets the next cursor on the response."""
+    created_at_column = col(getattr(model, "created_at"))
+    id_column = col(getattr(model, "id"))
+    if cursor is not None:
+        created_at, id = decode_cursor(cursor)
+        if descending:
+            after_cursor = or_(
+                created_at_column < created_at,
+                and_(created_at_column == created_at, id_column < id),
+            )
+        else:
+            after_cursor = or_(
+                created_at_column > created_at,
+                and_(created_at_column == created_at, id_column > id),
+            )
+        statement = statement.where(after_cursor)
+    if descending:
+        statement = statement.order_by(created_at_column.desc(), id_column.desc())
+    else:
+        statement = statement.order_by(created_at_column, id_column)
+    statement = statement.limit(limit + 1)
+    if plan:
+        statement = statement.options(*plan)
+    rows = list(session.exec(statement).all())
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(last, "created_at"), getattr(last, "id")
+        )
+    return rows
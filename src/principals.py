@@ -0,0 +1,55 @@
+"""Authenticated users as handlers see them, and an in-process cache of them keyed by token subject
+(the user email).
+
+A `Principal` only holds ids, so it is attached to no session: handlers that need the user load it in
+their own session.
+
+Entries expire after `PRINCIPAL_CACHE_TTL` seconds and the least recently used ones are evicted beyond
+`PRINCIPAL_CACHE_SIZE`. Any flush that changes or deletes a user drops its entry, so this worker never
+authorizes with stale data. Other workers keep their own cache, which bounds their staleness to the TTL. Writes that move
+money bypass the cache through `get_verified_user`."""
+
+import os
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import event, inspect
+from sqlmodel import Session
+
+from src.cache import TTLCache
+from src.models import User
+
+
+class Principal(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: int
+    email: str
+    flat_id: int | None = None
+
+
+principal_cache = TTLCache(
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "30")),
+    max_size=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+)
+
+
+def cached_principal(subject: str) -> Principal | None:
+    return principal_cache.get(subject)
+
+
+def remember_principal(subject: str, user: User, generation: int) -> Principal:
+    principal = Principal(id=user.id, email=user.email, flat_id=user.flat_id)
+    principal_cache.put(subject, principal, generation)
+    return principal
+
+
+@event.listens_for(Session, "after_flush")
+def invalidate_principals(session, _flush_context):
+    for obj in session.dirty | session.deleted:
+        if isinstance(obj, User):
+            # Covers the previous subject when the email itself changed
+            emails = inspect(obj).attrs.email.history.sum()
+            if not emails:
+                principal_cache.clear()
+            for email in emails:
+                principal_cache.invalidate(email)
@@ -0,0 +1,112 @@
+"""Counts the SQL statements and database time of every request.
+
+`profile_queries` hooks the cursor events of an engine and adds each statement to the `QueryStats` of
+the current request, found through a context variable. Sync endpoints and dependencies run in the
+threadpool with a copy of that context, so their statements are counted too.
+
+With `QUERY_DEBUG=true`, responses carry `X-Query-Count` and `X-Query-Time-Ms`. Requests that run more
+than `SLOW_REQUEST_QUERIES` statements or spend more than `SLOW_REQUEST_DB_MS` in the database are
+logged as warnings whatever the debug setting."""
+
+import json
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.logger import logger
+
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "false").lower() == "true"
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "30"))
+SLOW_REQUEST_DB_MS = float(os.getenv("SLOW_REQUEST_DB_MS", "500"))
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+QUERY_TIME_HEADER = "X-Query-Time-Ms"
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _record(context) -> None:
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    context._query_start = None
+    stats = current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+
+def profile_queries(engine: Engine):
+    """Adds the statements of `engine` to the stats of the request that runs them.
+
+    The start time lives on the execution context of the statement, which a failing statement drops
+    along with it, rather than on the pooled connection that outlives it."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(_conn, _cursor, _statement, _parameters, context, _executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query(_conn, _cursor, _statement, _parameters, context, _executemany):
+        if context is not None:
+            _record(context)
+
+    @event.listens_for(engine, "handle_error")
+    def record_failed_query(exception_context):
+        if exception_context.execution_context is not None:
+            _record(exception_context.execution_context)
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_stats.set(stats)
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start" and QUERY_DEBUG:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (QUERY_COUNT_HEADER.lower().encode(), str(stats.count).encode()),
+                    (
+                        QUERY_TIME_HEADER.lower().encode(),
+                        f"{stats.seconds * 1000:.3f}".encode(),
+                    ),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_stats.reset(token)
+            if (
+                stats.count > SLOW_REQUEST_QUERIES
+                or stats.seconds * 1000 > SLOW_REQUEST_DB_MS
+            ):
+                route = getattr(scope.get("route"), "path", scope["path"])
+                log_dict = {
+                    "url": route,
+                    "method": scope["method"],
+                    "queries": stats.count,
+                    "db_ms": round(stats.seconds * 1000, 3),
+                }
+                logger.warning(json.dumps(log_dict), extra=log_dict)
@@ -0,0 +1,120 @@
+"""Dry-run quotes of moves, with the same amounts as the moves themselves and nothing written.
+
+Users ask for the same quote many times before moving, so quotes are cached per flat, user, date and
+excluded items for `QUOTE_CACHE_TTL` seconds, up to `QUOTE_CACHE_SIZE` of them. Any flush that changes
+an item, a flat or the flat of a user drops the quotes of the flats involved. Other workers keep their
+own cache, which bounds their staleness to the TTL."""
+
+import os
+from collections import defaultdict
+from collections.abc import Sequence
+from datetime import date
+from typing import Literal
+
+from sqlalchemy import event, inspect
+from sqlmodel import Session
+
+from src import ledger
+from src.cache import TTLCache
+from src.models import Flat, Item, MoveQuote, User
+from src.schedules import depreciation_schedules
+
+quote_cache = TTLCache(
+    ttl=float(os.getenv("QUOTE_CACHE_TTL", "60")),
+    max_size=int(os.getenv("QUOTE_CACHE_SIZE", "1024")),
+)
+
+
+def build_quote(
+    kind: Literal["move_in", "move_out"],
+    flat_id: int,
+    user_id: int,
+    date: date,
+    items: Sequence[Item],
+    rows: list[dict],
+) -> MoveQuote:
+    """Sums transaction rows per item and per counterparty of the moving user."""
+    item_amounts: dict[int, float] = defaultdict(float)
+    counterparties: dict[int, float] = defaultdict(float)
+    for row in rows:
+        item_amounts[row["item_id"]] += row["amount"]
+        counterparty = row["creditor_id"] if kind == "move_in" else row["debtor_id"]
+        counterparties[counterparty] += row["amount"]
+    prices = depreciation_schedules.prices(items, date)
+    return MoveQuote.model_validate(
+        {
+            "kind": kind,
+            "flat_id": flat_id,
+            "user_id": user_id,
+            "date": date,
+            "total": sum(item_amounts.values()),
+            "items": [
+                {
+                    "item_id": item.id,
+                    "name": item.name,
+                    "price": price,
+                    "amount": item_amounts[item.id or 0],
+                }
+                for item, price in zip(items, prices)
+            ],
+            "counterparties": [
+                {"user_id": counterparty_id, "amount": amount}
+                for counterparty_id, amount in sorted(counterparties.items())
+            ],
+        }
+    )
+
+
+def quote_move_in(
+    session: Session, flat_id: int, user_id: int, date: date, exclude_items: list[int]
+) -> MoveQuote:
+    key = ("move_in", flat_id, user_id, date, tuple(sorted(set(exclude_items))))
+    quote = quote_cache.get(key)
+    if quote is None:
+        generation = quote_cache.generation
+        items, rows = ledger.move_in_rows(
+            session, flat_id, user_id, date, exclude_items
+        )
+        quote = build_quote("move_in", flat_id, user_id, date, items, rows)
+        quote_cache.put(key, quote, generation)
+    return quote
+
+
+def quote_move_out(
+    session: Session, flat_id: int, user_id: int, date: date
+) -> MoveQuote:
+    key = ("move_out", flat_id, user_id, date, ())
+    quote = quote_cache.get(key)
+    if quote is None:
+        generation = quote_cache.generation
+        items, rows = ledger.move_out_rows(session, flat_id, user_id, date)
+        quote = build_quote("move_out", flat_id, user_id, date, items, rows)
+        quote_cache.put(key, quote, generation)
+    return quote
+
+
+def _flat_ids(obj: object) -> set[int]:
+    """Flats whose quotes depend on `obj`, before and after the flush."""
+    if isinstance(obj, Flat):
+        return {obj.id} if obj.id is not None else set()
+    if isinstance(obj, Item | User):
+        attrs = inspect(obj).attrs
+        flats = attrs.flat.history.sum()
+        return {
+            *(
+                flat_id
+                for flat_id in attrs.flat_id.history.sum()
+                if flat_id is not None
+            ),
+            *(flat.id for flat in flats if flat is not None and flat.id is not None),
+        }
+    return set()
+
+
+@event.listens_for(Session, "after_flush")
+def invalidate_quotes(session, _flush_context):
+    flat_ids: set[int] = set()
+    for obj in session.new | session.dirty | session.deleted:
+        flat_ids |= _flat_ids(obj)
+    if flat_ids:
+        quote_cache.invalidate_matching(lambda key: key[1] in flat_ids)
@@ -1,23 +1,46 @@
-from datetime import date
+from datetime import date, datetime, timezone
+from typing import Literal
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi.exceptions import HTTPException
 from sqlmodel import Session, select
 
-from src.authentication import get_current_user
-from src.buy_in import item_buy_in
-from src.buy_out import item_buy_out
+from src import (
+    batch,
+    checks,
+    export,
+    forecast,
+    ledger,
+    queries,
+    quotes,
+    settlement,
+    valuation,
+)
+from src.authentication import (
+    get_current_reader,
+    get_current_user,
+    get_verified_user,
+)
 from src.errors import unauthorized_error
 from src.models import (
+    BatchPublic,
+    BatchRequest,
+    BuyOutForecast,
     Flat,
     FlatCreate,
     FlatPublic,
     FlatPublicWithUsers,
     FlatUpdate,
+    FlatValuation,
+    MoveQuote,
+    SettlementPublic,
     User,
     UserPublicWithItems,
 )
-from src.utils import get_session
+from src.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from src.principals import Principal
+from src.utils import get_read_session, get_session
 
 router = APIRouter()
 
@@ -38,22 +61,23 @@ def add_flat(*, session: Session = Depends(get_session), flat: FlatCreate):
 @router.get("/flats/", response_model=list[FlatPublic])
 def fetch_flats(
     *,
-    session: Session = Depends(get_session),
-    offset: int = 0,
-    limit: int = Query(default=10, le=10),
+    session: Session = Depends(get_read_session),
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 ):
-    flats = session.exec(select(Flat).offset(offset).limit(limit)).all()
+    flats = paginate(session, select(Flat), Flat, response, cursor, limit)
     return flats
 
 
 @router.get("/flats/{flat_id}", response_model=FlatPublicWithUsers)
 def fetch_flat(
     *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
     flat_id: int,
 ):
-    flat = session.get(Flat, flat_id)
+    flat = queries.get_one(session, Flat, flat_id, queries.FLAT_WITH_USERS)
     if not flat:
         raise HTTPException(status_code=404, detail="Flat not found")
     if flat.id != current_user.flat_id:
@@ -65,7 +89,7 @@ def fetch_flat(
 def update_flat(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     flat_id: int,
     flat: FlatUpdate,
 ):
@@ -86,7 +110,7 @@ def update_flat(
 def delete_flat(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     flat_id: int,
 ):
     db_flat = session.get(User, flat_id)
@@ -107,7 +131,7 @@ def delete_flat(
 def user_move_in(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_verified_user),
     flat_id: int,
     user_id: int,
     exclude_items: list[int],
@@ -126,13 +150,10 @@ def user_move_in(
     db_user = session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    if db_user.flat is not None:
-        raise HTTPException(status_code=400, detail="User already in an flat")
+    checks.check_can_move_in(db_user)
+    checks.check_items_in_flat(session, flat_id, exclude_items)
     db_flat.users.append(db_user)
-    for item in db_flat.items:
-        if item.id not in exclude_items:
-            item_buy_in(session, db_user, item, date)
-            db_user.items.append(item)
+    ledger.move_in(session, db_flat, db_user, date, exclude_items)
 
     session.commit()
     session.refresh(db_user)
@@ -147,7 +168,7 @@ def user_move_in(
 def user_move_out(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_verified_user),
     flat_id: int,
     user_id: int,
     date: date,
@@ -162,21 +183,178 @@ def user_move_out(
         raise HTTPException(status_code=404, detail="Flat not found")
     if db_flat.id != current_user.flat_id:
         raise unauthorized_error
-    if len(db_flat.users) == 1:
-        raise HTTPException(status_code=404, detail="User is the last user in the flat")
     db_user = session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    if db_user.flat is None:
-        raise HTTPException(status_code=400, detail="User has no flat")
-    if db_user.flat.id != db_flat.id:
-        raise HTTPException(status_code=400, detail="User not in flat")
+    checks.check_can_move_out(db_flat, db_user)
 
-    for item in db_user.items:
-        item_buy_out(session, db_user, item, date)
+    ledger.move_out(session, db_flat, db_user, date)
 
     db_user.flat = None
-    db_user.items = []
     session.commit()
     session.refresh(db_user)
     return db_user
+
+
+@router.post("/flats/{flat_id}/batch", response_model=BatchPublic)
+def run_batch(
+    *,
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_verified_user),
+    flat_id: int,
+    request: BatchRequest,
+):
+    """Runs `add_item`, `add_user_to_item`, `remove_user_from_item`, `move_in` and `move_out`
+    operations in order, with the checks and amounts of their endpoints, and commits them together.
+
+    If an operation fails, nothing is written and the error detail names the operation's index."""
+    if flat_id != current_user.flat_id:
+        raise unauthorized_error
+    db_flat = queries.get_one(session, Flat, flat_id, queries.FLAT_WITH_USERS)
+    if not db_flat:
+        raise HTTPException(status_code=404, detail="Flat not found")
+    results = batch.Batch(session, db_flat, request.operations).run()
+    session.commit()
+    return BatchPublic(flat_id=flat_id, results=results)
+
+
+@router.get("/flats/{flat_id}/move_in/{user_id}/quote", response_model=MoveQuote)
+def quote_move_in(
+    *,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    flat_id: int,
+    user_id: int,
+    date: date,
+    exclude_items: list[int] = Query(default=[]),
+):
+    """What `POST /flats/{flat_id}/move_in/{user_id}` would cost the user, per item and per owner.
+
+    Nothing is written."""
+    if flat_id != current_user.flat_id:
+        raise unauthorized_error
+    if not session.get(Flat, flat_id):
+        raise HTTPException(status_code=404, detail="Flat not found")
+    db_user = session.get(User, user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    checks.check_can_move_in(db_user)
+    checks.check_items_in_flat(session, flat_id, exclude_items)
+    return quotes.quote_move_in(session, flat_id, user_id, date, exclude_items)
+
+
+@router.get("/flats/{flat_id}/move_out/{user_id}/quote", response_model=MoveQuote)
+def quote_move_out(
+    *,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    flat_id: int,
+    user_id: int,
+    date: date,
+):
+    """What `POST /flats/{flat_id}/move_out/{user_id}` would pay the user, per item and per owner.
+
+    Nothing is written."""
+    if flat_id != current_user.flat_id:
+        raise unauthorized_error
+    if not session.get(Flat, flat_id):
+        raise HTTPException(status_code=404, detail="Flat not found")
+    db_user = session.get(User, user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    checks.check_in_flat(db_user, flat_id)
+    return quotes.quote_move_out(session, flat_id, user_id, date)
+
+
+@router.get("/flats/{flat_id}/settlement", response_model=SettlementPublic)
+def fetch_settlement(
+    *,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    flat_id: int,
+):
+    """The fewest transfers that settle every open debt of the flat."""
+    if flat_id != current_user.flat_id:
+        raise unauthorized_error
+    if not session.get(Flat, flat_id):
+        raise HTTPException(status_code=404, detail="Flat not found")
+    return SettlementPublic(
+        flat_id=flat_id, transfers=settlement.plan_settlement(session, flat_id)
+    )
+
+
+@router.post("/flats/{flat_id}/settlement", response_model=SettlementPublic)
+def settle_flat(
+    *,
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_verified_user),
+    flat_id: int,
+):
+    """Marks every open transaction of the flat as paid.
+
+    The returned transfers are the ones to make, computed in the same database transaction, so they
+    cover exactly the transactions that were settled."""
+    if flat_id != current_user.flat_id:
+        raise unauthorized_error
+    if not session.get(Flat, flat_id):
+        raise HTTPException(status_code=404, detail="Flat not found")
+    transfers, settled = settlement.settle_flat(session, flat_id)
+    session.commit()
+    return SettlementPublic(flat_id=flat_id, transfers=transfers, settled=settled)
+
+
+@router.get("/flats/{flat_id}/export", response_class=StreamingResponse)
+def export_ledger(
+    *,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    flat_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+):
+    """Streams every transaction of the flat with its item and user names, oldest first."""
+    if flat_id != current_user.flat_id:
+        raise unauthorized_error
+    if not session.get(Flat, flat_id):
+        raise HTTPException(status_code=404, detail="Flat not found")
+    return StreamingResponse(
+        export.stream_ledger(session, flat_id, format),
+        media_type=export.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="flat-{flat_id}-ledger.{format}"'
+        },
+    )
+
+
+@router.get("/flats/{flat_id}/valuation", response_model=FlatValuation)
+def fetch_valuation(
+    *,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    flat_id: int,
+    date: date | None = None,
+):
+    """What every item of the flat is worth at `date` (today by default), and each owner's share."""
+    if flat_id != current_user.flat_id:
+        raise unauthorized_error
+    if not session.get(Flat, flat_id):
+        raise HTTPException(status_code=404, detail="Flat not found")
+    when = date or datetime.now(timezone.utc).date()
+    return valuation.value_flat(session, flat_id, when)
+
+
+@router.get("/flats/{flat_id}/forecast", response_model=BuyOutForecast)
+def fetch_forecast(
+    *,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    flat_id: int,
+    years: int = Query(default=3, ge=1, le=10),
+    start: date | None = None,
+):
+    """What every member would be paid for moving out at each month-end of the next `years` years."""
+    if flat_id != current_user.flat_id:
+        raise unauthorized_error
+    if not session.get(Flat, flat_id):
+        raise HTTPException(status_code=404, detail="Flat not found")
+    start = start or datetime.now(timezone.utc).date()
+    return forecast.forecast_buy_outs(session, flat_id, start, years)
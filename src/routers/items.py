@@ -1,10 +1,15 @@
 from datetime import date
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from fastapi.exceptions import HTTPException
 from sqlmodel import Session, select
 
-from src.authentication import get_current_user
+from src import checks, queries
+from src.authentication import (
+    get_current_reader,
+    get_current_user,
+    get_verified_user,
+)
 from src.buy_in import item_buy_in
 from src.buy_out import item_buy_out
 from src.errors import unauthorized_error
@@ -18,7 +23,9 @@ from src.models import (
     ItemUpdate,
     User,
 )
-from src.utils import get_session
+from src.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from src.principals import Principal
+from src.utils import get_read_session, get_session
 
 router = APIRouter()
 
@@ -41,22 +48,25 @@ def add_item(*, session: Session = Depends(get_session), item: ItemCreate):
 @router.get("/items/", response_model=list[ItemPublicWithUsers])
 def fetch_items(
     *,
-    session: Session = Depends(get_session),
-    offset: int = 0,
-    limit: int = Query(default=10, le=10),
+    session: Session = Depends(get_read_session),
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 ):
-    items = session.exec(select(Item).offset(offset).limit(limit)).all()
+    items = paginate(
+        session, select(Item), Item, response, cursor, limit, queries.ITEM_WITH_USERS
+    )
     return items
 
 
 @router.get("/items/{item_id}", response_model=ItemPublicWithUsers)
 def fetch_item(
     *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
     item_id: int,
 ):
-    item = session.get(Item, item_id)
+    item = queries.get_one(session, Item, item_id, queries.ITEM_WITH_USERS)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if item.flat_id != current_user.flat_id:
@@ -67,11 +77,11 @@ def fetch_item(
 @router.get("/items/{item_id}/transactions/", response_model=ItemPublicWithTransactions)
 def fetch_item_with_transactions(
     *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
     item_id: int,
 ):
-    item = session.get(Item, item_id)
+    item = queries.get_one(session, Item, item_id, queries.ITEM_WITH_TRANSACTIONS)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if item.flat_id != current_user.flat_id:
@@ -83,7 +93,7 @@ def fetch_item_with_transactions(
 def update_item(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     item_id: int,
     item: ItemUpdate,
 ):
@@ -104,7 +114,7 @@ def update_item(
 def delete_item(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     item_id: int,
 ):
     db_item = session.get(Item, item_id)
@@ -121,22 +131,19 @@ def delete_item(
 def add_user_to_item(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_verified_user),
     item_id: int,
     user_id: int,
     date: date = Query(...),
 ):
     """This adds a User to an item and creates the associated credits/debts."""
-    db_item = session.get(Item, item_id)
-    if not db_item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if db_item.flat_id != current_user.flat_id:
-        raise unauthorized_error
+    db_item = checks.check_item_in_flat(
+        session.get(Item, item_id), current_user.flat_id
+    )
     db_user = session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    if db_user in db_item.users:
-        raise HTTPException(status_code=409, detail="User is already assigned to item")
+    checks.check_can_buy_in(db_user, db_item)
 
     item_buy_in(session, db_user, db_item, date)
     db_item.users.append(db_user)
@@ -150,25 +157,21 @@ def add_user_to_item(
 def remove_user_from_item(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_verified_user),
     item_id: int,
     user_id: int,
     date: date,
 ):
     """This removes a User from an item and creates the associated credits/debts."""
-    db_item = session.get(Item, item_id)
-    if not db_item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if db_item.flat_id != current_user.flat_id:
-        raise unauthorized_error
+    db_item = checks.check_item_in_flat(
+        session.get(Item, item_id), current_user.flat_id
+    )
     db_user = session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    if db_user in db_item.users:
-        item_buy_out(session, db_user, db_item, date)
-        db_item.users.remove(db_user)
-    else:
-        raise HTTPException(status_code=404, detail="User was not item owner")
+    checks.check_can_buy_out(db_user, db_item)
+    item_buy_out(session, db_user, db_item, date)
+    db_item.users.remove(db_user)
 
     session.commit()
     session.refresh(db_item)
@@ -1,24 +1,25 @@
 from datetime import timedelta
 
-import requests
 from fastapi import APIRouter, Depends, status
 from fastapi.exceptions import HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from src import google_oauth
 from src.authentication import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     Token,
     create_access_token,
-    get_current_user,
+    get_current_reader,
     google_client_id,
     google_client_secret,
     google_redirect_url,
 )
+from src.hashing import check_hash_async
 from src.models import User, UserCreateNP
-from src.utils import check_hash, get_session
+from src.principals import Principal
+from src.utils import get_async_session, get_read_session
 
 router = APIRouter()
 
@@ -40,7 +41,7 @@ async def login_google():
 
     return {
         "url": (
-            f"https://accounts.google.com/o/oauth2/auth?"
+            f"{google_oauth.GOOGLE_AUTH_URL}?"
             f"response_type=code&client_id={google_client_id}&"
             f"redirect_uri={google_redirect_url}&scope=openid%20profile%20email&"
             f"access_type=offline"
@@ -53,9 +54,8 @@ async def login_google():
     response_model=Token,
     summary="Handle Google OAuth callback and issue internal token. Creates new user if none exists.",
 )
-async def auth_google(code: str, session: Session = Depends(get_session)):
+async def auth_google(code: str, session: AsyncSession = Depends(get_async_session)):
     """This endpoint handles the callback from Google after the user grants permission."""
-    token_url = "https://accounts.google.com/o/oauth2/token"
     data = {
         "code": code,
         "client_id": google_client_id,
@@ -63,9 +63,7 @@ async def auth_google(code: str, session: Session = Depends(get_session)):
         "redirect_uri": google_redirect_url,
         "grant_type": "authorization_code",
     }
-    response = requests.post(token_url, data=data)
-    response.raise_for_status()
-    tokens = response.json()
+    tokens = await google_oauth.exchange_code(data)
     google_access_token = tokens.get("access_token")
     google_id_token = tokens.get("id_token")
 
@@ -75,9 +73,7 @@ async def auth_google(code: str, session: Session = Depends(get_session)):
             detail="Missing access_token or id_token from Google response.",
         )
 
-    idinfo = id_token.verify_oauth2_token(
-        google_id_token, google_requests.Request(), google_client_id
-    )
+    idinfo = await google_oauth.verify_id_token(google_id_token, google_client_id)
     if idinfo["aud"] != google_client_id:
         raise ValueError("Could not verify audience.")
     if idinfo["iss"] not in ["accounts.google.com", "https://accounts.google.com"]:
@@ -92,13 +88,9 @@ async def auth_google(code: str, session: Session = Depends(get_session)):
         )
 
     statement = select(User).where(User.email == user_email)
-    user = session.exec(statement).one_or_none()
+    user = (await session.exec(statement)).one_or_none()
     if not user:
-        headers = {"Authorization": f"Bearer {google_access_token}"}
-        resp = requests.get(
-            "https://www.googleapis.com/oauth2/v3/userinfo", headers=headers
-        )
-        user_info = resp.json()
+        user_info = await google_oauth.fetch_userinfo(google_access_token)
         first_name = user_info.get("given_name")
         last_name = user_info.get("family_name")
         new_User = UserCreateNP(
@@ -106,7 +98,7 @@ async def auth_google(code: str, session: Session = Depends(get_session)):
         )
         db_user = User.model_validate(new_User)
         session.add(db_user)
-        session.commit()
+        await session.commit()
         user = db_user
 
     token_expiration = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -119,26 +111,34 @@ async def auth_google(code: str, session: Session = Depends(get_session)):
 @router.post("/token", summary="Login endpoint for email/password")
 async def login_for_token(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Token:
     """This endpoint allows logging in with a standard OAuth password request form. The email is used as username."""
     statement = select(User).where(User.email == form_data.username)
-    user = session.exec(statement).one_or_none()
+    user = (await session.exec(statement)).one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="Cannot authenticate")
     if user.hashed_password is None:
         raise HTTPException(status_code=404, detail="Cannot authenticate")
-    if not check_hash(form_data.password, user.hashed_password):
+    email, hashed_password = user.email, user.hashed_password
+    # Give the connection back to the pool while bcrypt runs
+    await session.close()
+    if not await check_hash_async(form_data.password, hashed_password):
         raise HTTPException(status_code=404, detail="Cannot authenticate")
 
     token_expiration = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires=token_expiration
-    )
+    access_token = create_access_token(data={"sub": email}, expires=token_expiration)
     return Token(access_token=access_token, token_type="bearer")
 
 
 @router.get("/me", response_model=User)
-async def read_me(current_user: User = Depends(get_current_user)):
-    return current_user
+def read_me(
+    *,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+):
+    user = session.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials 3")
+    return user
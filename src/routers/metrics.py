@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src import logger, metrics
+from src.principals import principal_cache
+from src.quotes import quote_cache
+from src.schedules import depreciation_schedules
+from src.utils import engines
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def fetch_metrics():
+    """Request, connection pool and cache metrics of this worker, in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render(
+            metrics.metrics,
+            engines(),
+            {
+                "principal": principal_cache.stats(),
+                "depreciation": depreciation_schedules.stats(),
+                "quote": quote_cache.stats(),
+            },
+            logger.dropped_records(),
+        ),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -1,63 +1,82 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session as SQLASession
+from dataclasses import asdict
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy import delete
-from sqlmodel import SQLModel
-from datetime import datetime
+from sqlmodel import Session, SQLModel
 
-from src.models import User, Flat, Item  # adjust your imports
-from src.utils import get_session, hash_password
+from src import seed
+from src.hashing import hash_password
+from src.migrations import SchemaVersion
+from src.models import Flat, Item, User
+from src.principals import principal_cache
+from src.quotes import quote_cache
+from src.schedules import depreciation_schedules
+from src.utils import get_session
 
 router = APIRouter()
 
 
 @router.post("/reset/")
-def reset_app(*, session: SQLASession = Depends(get_session)):
+def reset_app(
+    *,
+    session: Session = Depends(get_session),
+    flats: int = Query(default=0, ge=0, le=1000),
+    users: int = Query(default=4, ge=2, le=50),
+    items: int = Query(default=20, ge=1, le=500),
+    transactions: int = Query(default=100, ge=0, le=10_000),
+    exclusion_rate: float = Query(default=0.1, ge=0, lt=1),
+    seed_value: int = Query(default=0, alias="seed"),
+):
+    """Empties the database and adds the demo flat, plus `flats` generated flats when given."""
+    for table in reversed(SQLModel.metadata.sorted_tables):
+        if table is not SchemaVersion.__table__:
+            session.execute(delete(table))
+    # The deletes bypass the flush events that keep the caches fresh, and ids are reused after them
+    principal_cache.clear()
+    depreciation_schedules.clear()
+    quote_cache.clear()
+
+    hashed_password = hash_password(seed.PASSWORD)
     user_1 = User(
         first_name="Yann",
         last_name="Wallis",
         email="y.w@g.c",
-        flat_id=None,
-        hashed_password=hash_password("pw"),
+        hashed_password=hashed_password,
     )
-
     user_2 = User(
         first_name="Ilias",
         last_name="Trichopoulos",
         email="i.t@g.c",
-        flat_id=None,
-        hashed_password=hash_password("pw"),
+        hashed_password=hashed_password,
     )
-
-    flat_1 = Flat(name="Olympus")
-
+    flat_1 = Flat(name="Olympus", users=[user_1])
     item_1 = Item(
         name="TV",
+        flat=flat_1,
+        users=[user_1],
         is_bill=False,
         initial_value=1000.0,
-        purchase_date=datetime.strptime("2025-01-01", "%Y-%m-%d"),
+        purchase_date=date(2025, 1, 1),
         yearly_depreciation=0.2,
         minimum_value=None,
         minimum_value_pct=None,
     )
+    session.add_all([user_1, user_2, flat_1, item_1])
+    session.flush()
 
-    for table in reversed(SQLModel.metadata.sorted_tables):
-        session.execute(delete(table))
-    session.commit()
-
-    session.add(user_1)
-    session.add(user_2)
-    session.commit()
-    session.refresh(user_1)
-    session.refresh(user_2)
-
-    flat_1.users.append(user_1)
-    session.add(flat_1)
+    response: dict = {"deleted": True}
+    if flats:
+        report = seed.generate(
+            session,
+            flats,
+            users,
+            items,
+            transactions,
+            exclusion_rate,
+            seed_value,
+            hashed_password=hashed_password,
+        )
+        response["seeded"] = asdict(report)
     session.commit()
-    session.refresh(flat_1)
-
-    item_1.flat_id = flat_1.id
-    item_1.users = flat_1.users
-    session.add(item_1)
-    session.commit()
-
-    return {"deleted": True}
+    return response
@@ -1,17 +1,29 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Response
 from fastapi.exceptions import HTTPException
-from sqlmodel import Session
+from sqlalchemy import and_, or_
+from sqlmodel import Session, col
 
-from src.authentication import get_current_user
+from src import ledger, queries
+from src.authentication import get_current_reader, get_verified_user
+from src.balances import apply_transactions, transaction_row
 from src.errors import unauthorized_error
 from src.models import (
     Transaction,
+    TransactionBulkUpdate,
+    TransactionBulkUpdated,
     TransactionCreate,
     TransactionPublic,
     TransactionPublicWithUsers,
+    TransactionUpdate,
     User,
 )
-from src.utils import get_session
+from src.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from src.principals import Principal
+from src.timestamps import naive_utc
+from src.utils import get_read_session, get_session
 
 router = APIRouter()
 
@@ -22,6 +34,69 @@ def add_transaction(
 ):
     db_transaction = Transaction.model_validate(transaction)
     session.add(db_transaction)
+    if not db_transaction.paid:
+        apply_transactions(session, [transaction_row(db_transaction)])
+    session.commit()
+    session.refresh(db_transaction)
+    return db_transaction
+
+
+@router.patch("/transactions/", response_model=TransactionBulkUpdated)
+def update_transactions(
+    *,
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_verified_user),
+    transactions: TransactionBulkUpdate,
+):
+    """Marks many transactions of the current user as paid or unpaid in a single statement.
+
+    Transactions where the current user is neither creditor nor debtor are left alone."""
+    if (
+        transactions.ids is None
+        and transactions.counterparty_id is None
+        and transactions.item_id is None
+        and transactions.before is None
+    ):
+        raise HTTPException(
+            status_code=400, detail="Select transactions by ids or by filter"
+        )
+    creditor = col(Transaction.creditor_id) == current_user.id
+    debtor = col(Transaction.debtor_id) == current_user.id
+    conditions = [or_(creditor, debtor)]
+    if transactions.ids is not None:
+        conditions.append(col(Transaction.id).in_(transactions.ids))
+    if transactions.counterparty_id is not None:
+        conditions.append(
+            or_(
+                and_(creditor, Transaction.debtor_id == transactions.counterparty_id),
+                and_(debtor, Transaction.creditor_id == transactions.counterparty_id),
+            )
+        )
+    if transactions.item_id is not None:
+        conditions.append(Transaction.item_id == transactions.item_id)
+    if transactions.before is not None:
+        conditions.append(col(Transaction.created_at) < naive_utc(transactions.before))
+    rows = ledger.set_paid(session, transactions.paid, *conditions)
+    session.commit()
+    return TransactionBulkUpdated(updated=len(rows))
+
+
+@router.patch("/transactions/{transaction_id}", response_model=TransactionPublic)
+def update_transaction(
+    *,
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_verified_user),
+    transaction_id: int,
+    transaction: TransactionUpdate,
+):
+    """Marks a transaction as paid or unpaid. Only its creditor or debtor can."""
+    db_transaction = session.get(Transaction, transaction_id)
+    if not db_transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    if current_user.id not in (db_transaction.creditor_id, db_transaction.debtor_id):
+        raise unauthorized_error
+    # Conditional on the stored flag, so concurrent updates move the balances once
+    ledger.set_paid(session, transaction.paid, col(Transaction.id) == transaction_id)
     session.commit()
     session.refresh(db_transaction)
     return db_transaction
@@ -30,34 +105,70 @@ def add_transaction(
 @router.get("/transactions/{user_id}/debts", response_model=list[TransactionPublic])
 def fetch_user_debts(
     *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    response: Response,
     user_id: int,
     paid: bool = False,
+    item_id: int | None = None,
+    creditor_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    order: Literal["asc", "desc"] = "asc",
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 ):
+    """Debts of a user, oldest first unless `order=desc`. `until` is exclusive."""
     db_user = session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     if db_user.flat_id != current_user.flat_id:
         raise unauthorized_error
-    output = [transaction for transaction in db_user.debts if transaction.paid == paid]
-    return output
+    statement = queries.user_transactions(
+        user_id, True, paid, item_id, creditor_id, since, until
+    )
+    return paginate(
+        session,
+        statement,
+        Transaction,
+        response,
+        cursor,
+        limit,
+        descending=order == "desc",
+    )
 
 
 @router.get("/transactions/{user_id}/credits", response_model=list[TransactionPublic])
 def fetch_user_credits(
     *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    response: Response,
     user_id: int,
     paid: bool = False,
+    item_id: int | None = None,
+    debtor_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    order: Literal["asc", "desc"] = "asc",
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 ):
+    """Credits of a user, oldest first unless `order=desc`. `until` is exclusive."""
     db_user = session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     if db_user.flat_id != current_user.flat_id:
         raise unauthorized_error
-    output = [
-        transaction for transaction in db_user.credits if transaction.paid == paid
-    ]
-    return output
+    statement = queries.user_transactions(
+        user_id, False, paid, item_id, debtor_id, since, until
+    )
+    return paginate(
+        session,
+        statement,
+        Transaction,
+        response,
+        cursor,
+        limit,
+        descending=order == "desc",
+    )
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from fastapi.exceptions import HTTPException
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
-from src.authentication import get_current_user
+from src import queries
+from src.authentication import get_current_reader, get_current_user
 from src.errors import unauthorized_error
 from src.models import (
+    Balance,
+    BalancePublic,
     User,
     UserCreate,
     UserPublic,
@@ -13,7 +16,10 @@ from src.models import (
     UserPublicWithTransactions,
     UserUpdate,
 )
-from src.utils import get_session, hash_password
+from src.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from src.principals import Principal
+from src.hashing import hash_password
+from src.utils import get_read_session, get_session
 
 router = APIRouter()
 
@@ -37,22 +43,23 @@ def add_user(*, session: Session = Depends(get_session), user: UserCreate):
 @router.get("/users/", response_model=list[UserPublic])
 def fetch_users(
     *,
-    session: Session = Depends(get_session),
-    offset: int = 0,
-    limit: int = Query(default=10, le=10),
+    session: Session = Depends(get_read_session),
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 ):
-    users = session.exec(select(User).offset(offset).limit(limit)).all()
+    users = paginate(session, select(User), User, response, cursor, limit)
     return users
 
 
 @router.get("/users/{user_id}", response_model=UserPublicWithItems)
 def fetch_user(
     *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
     user_id: int,
 ):
-    user = session.get(User, user_id)
+    user = queries.get_one(session, User, user_id, queries.USER_WITH_ITEMS)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.flat_id != current_user.flat_id:
@@ -63,11 +70,11 @@ def fetch_user(
 @router.get("/users/{user_id}/transactions", response_model=UserPublicWithTransactions)
 def fetch_user_with_transactions(
     *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
     user_id: int,
 ):
-    user = session.get(User, user_id)
+    user = queries.get_one(session, User, user_id, queries.USER_WITH_TRANSACTIONS)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.flat_id != current_user.flat_id:
@@ -75,11 +82,54 @@ def fetch_user_with_transactions(
     return user
 
 
+@router.get("/users/{user_id}/balance", response_model=BalancePublic)
+def fetch_user_balance(
+    *,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_reader),
+    user_id: int,
+    flat_id: int | None = None,
+):
+    """Unpaid credit and debt of a user in a flat, read from the materialized balances.
+
+    The flat defaults to the user's current one. A user who moved out keeps the credits of the buy-outs
+    in their former flat: without a current flat, the one flat they have a balance in is used."""
+    user = session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if flat_id is None:
+        flat_id = user.flat_id
+    if flat_id is None:
+        flat_ids = session.exec(
+            select(Balance.flat_id).where(Balance.user_id == user_id).limit(2)
+        ).all()
+        if not flat_ids:
+            raise HTTPException(status_code=404, detail="User has no balance")
+        if len(flat_ids) > 1:
+            raise HTTPException(
+                status_code=400, detail="User has balances in several flats"
+            )
+        flat_id = flat_ids[0]
+    # Users see their own balances, and members those of their flat
+    if user_id != current_user.id and flat_id != current_user.flat_id:
+        raise unauthorized_error
+    balance = session.get(Balance, (flat_id, user_id)) or Balance(
+        flat_id=flat_id, user_id=user_id
+    )
+    return BalancePublic(
+        flat_id=balance.flat_id,
+        user_id=balance.user_id,
+        credit=balance.credit,
+        debt=balance.debt,
+        net=balance.credit - balance.debt,
+    )
+
+
 @router.patch("/users/{user_id}", response_model=UserPublic)
 def update_user(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     user_id: int,
     user: UserUpdate,
 ):
@@ -106,7 +156,7 @@ def update_user(
 def delete_user(
     *,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     user_id: int,
 ):
     db_user = session.get(User, user_id)
@@ -0,0 +1,137 @@
+"""In-process cache of depreciation schedules, the daily prices of items computed ahead in blocks.
+
+The price of an item only depends on its depreciation fields and the days since its purchase. A block holds
+the prices of one item for `DEPRECIATION_BLOCK_DAYS` consecutive days, computed with `depreciate_prices`,
+and is keyed by item id and block number. The least recently used blocks are evicted beyond
+`DEPRECIATION_CACHE_SIZE`. Any flush that changes the depreciation fields of an item or deletes it drops
+its blocks. Blocks also keep the fields they were computed from, so an item edited but not flushed yet
+is never priced from a stale block."""
+
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import date
+from operator import attrgetter
+
+import numpy as np
+from fastapi.exceptions import HTTPException
+from sqlalchemy import event, inspect
+from sqlmodel import Session
+
+from src.depreciation import depreciate_prices
+from src.models import Item
+
+SCHEDULE_FIELDS = (
+    "initial_value",
+    "purchase_date",
+    "yearly_depreciation",
+    "minimum_value",
+    "minimum_value_pct",
+)
+
+# Purchase dates are shifted onto this one, so that blocks of different items share their dates
+_EPOCH = np.datetime64("2000-01-01", "D")
+_fields = attrgetter(*SCHEDULE_FIELDS)
+
+
+class DepreciationSchedules:
+    def __init__(self, max_size: int, block_days: int):
+        self.max_size = max_size
+        self.block_days = block_days
+        self.hits = 0
+        self.misses = 0
+        self._blocks: OrderedDict[tuple[int | None, int], tuple[tuple, array]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def price(self, item: Item, when: date) -> float:
+        """Same as `depreciate_price`."""
+        return self.prices([item], when)[0]
+
+    def prices(self, items: Sequence[Item], when: date) -> list[float]:
+        """Same as `depreciate_items(items, [when])[:, 0]`, missing blocks are computed together."""
+        prices: list[float] = [0.0] * len(items)
+        missing: list[tuple[int, int, int]] = []
+        with self._lock:
+            for index, item in enumerate(items):
+                fields = _fields(item)
+                days = (when - fields[1]).days
+                if days < 0:
+                    raise HTTPException(
+                        status_code=400,
+                        detail="Date of depreciation cannot be before date of purchase",
+                    )
+                block, offset = divmod(days, self.block_days)
+                key = (item.id, block)
+                entry = self._blocks.get(key)
+                if entry is not None and entry[0] == fields:
+                    self._blocks.move_to_end(key)
+                    self.hits += 1
+                    prices[index] = entry[1][offset]
+                    continue
+                self.misses += 1
+                missing.append((index, block, offset))
+        if not missing:
+            return prices
+
+        missing_items = [items[index] for index, _, _ in missing]
+        shifts = np.array([block * self.block_days for _, block, _ in missing])
+        schedules = depreciate_prices(
+            [item.initial_value for item in missing_items],
+            _EPOCH - shifts,
+            [item.yearly_depreciation for item in missing_items],
+            [item.minimum_value for item in missing_items],
+            [item.minimum_value_pct for item in missing_items],
+            _EPOCH + np.arange(self.block_days),
+        )
+        with self._lock:
+            for (index, block, offset), item, schedule in zip(
+                missing, missing_items, schedules
+            ):
+                prices[index] = float(schedule[offset])
+                if item.id is not None and self.max_size > 0:
+                    self._blocks[(item.id, block)] = (
+                        _fields(item),
+                        array("d", schedule),
+                    )
+                    self._blocks.move_to_end((item.id, block))
+            while len(self._blocks) > self.max_size:
+                self._blocks.popitem(last=False)
+        return prices
+
+    def invalidate(self, item_id: int):
+        with self._lock:
+            for key in [key for key in self._blocks if key[0] == item_id]:
+                del self._blocks[key]
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._blocks),
+            }
+
+
+depreciation_schedules = DepreciationSchedules(
+    max_size=int(os.getenv("DEPRECIATION_CACHE_SIZE", "4096")),
+    block_days=int(os.getenv("DEPRECIATION_BLOCK_DAYS", "92")),
+)
+
+
+@event.listens_for(Session, "after_flush")
+def invalidate_schedules(session, _flush_context):
+    for obj in session.dirty | session.deleted:
+        if isinstance(obj, Item) and obj.id is not None:
+            attrs = inspect(obj).attrs
+            if obj in session.deleted or any(
+                attrs[name].history.has_changes() for name in SCHEDULE_FIELDS
+            ):
+                depreciation_schedules.invalidate(obj.id)
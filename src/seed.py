@@ -0,0 +1,289 @@
+"""Generates synthetic flats for load tests and benchmarks.
+
+Every flat gets members, items owned by all members but a random few, and a history of transactions
+between co-owners, some of them paid. Rows are written with multi-row inserts using ids assigned up
+front, and all users share one password hash, so a million transactions take seconds rather than
+hours. The same `seed` gives the same data.
+
+Run with `uv run python -m src.seed --flats 100 --transactions 10000` to seed the database from
+`DATABASE_URL`. Every generated user logs in with the password `pw`."""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from operator import itemgetter
+
+import numpy as np
+from sqlalchemy import bindparam, func, insert, text
+from sqlmodel import Session, select
+
+from src.balances import apply_transactions
+from src.hashing import hash_password
+from src.models import Flat, Item, Transaction, User, UserItems
+
+PASSWORD = "pw"
+BATCH_SIZE = 10_000
+TRANSACTION_COLUMNS = [
+    "creditor_id", "debtor_id", "item_id", "amount", "paid", "created_at", "updated_at"
+]  # fmt: skip
+
+FIRST_NAMES = [
+    "Alex", "Sam", "Charlie", "Jordan", "Robin", "Camille", "Noor", "Mateo",
+    "Yuki", "Amara", "Lena", "Tomás", "Ines", "Kofi", "Priya", "Elias",
+]  # fmt: skip
+LAST_NAMES = [
+    "Martin", "Nguyen", "Okafor", "Rossi", "Schmidt", "Dubois", "Kowalski",
+    "Silva", "Haddad", "Jensen", "Moreau", "Tanaka", "Novak", "Garcia",
+]  # fmt: skip
+# Name, typical price and yearly depreciation
+ITEMS = [
+    ("TV", 600.0, 0.2), ("Sofa", 900.0, 0.1), ("Fridge", 700.0, 0.1),
+    ("Washing machine", 500.0, 0.12), ("Dining table", 400.0, 0.08),
+    ("Microwave", 120.0, 0.15), ("Vacuum cleaner", 250.0, 0.2),
+    ("Coffee machine", 300.0, 0.2), ("Router", 90.0, 0.3),
+    ("Bookshelf", 150.0, 0.05), ("Oven", 450.0, 0.1), ("Lamp", 60.0, 0.1),
+]  # fmt: skip
+
+
+@dataclass
+class SeedReport:
+    flats: list[int] = field(default_factory=list)
+    users: int = 0
+    items: int = 0
+    transactions: int = 0
+
+
+def _next_id(session: Session, model) -> int:
+    return (session.exec(select(func.max(model.id))).one() or 0) + 1
+
+
+def _write(session: Session, model, rows: list[dict]):
+    for start in range(0, len(rows), BATCH_SIZE):
+        session.connection().execute(
+            insert(model.__table__), rows[start : start + BATCH_SIZE]
+        )
+
+
+def _write_transactions(session: Session, rows: list[tuple]):
+    """Inserts transaction tuples in `TRANSACTION_COLUMNS` order through the driver.
+
+    At a million rows, SQLAlchemy's per-row parameter processing costs more than the inserts, so the
+    statement is compiled once and timestamps come preformatted on SQLite."""
+    connection = session.connection()
+    compiled = (
+        insert(Transaction.__table__)  # type: ignore
+        .values({name: bindparam(name) for name in TRANSACTION_COLUMNS})
+        .compile(dialect=connection.dialect)
+    )
+    if not compiled.positional:
+        rows = [dict(zip(TRANSACTION_COLUMNS, row)) for row in rows]  # type: ignore
+    elif compiled.positiontup != TRANSACTION_COLUMNS:
+        # Compiled in table order
+        reorder = itemgetter(*map(TRANSACTION_COLUMNS.index, compiled.positiontup))
+        rows = list(map(reorder, rows))
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.exec_driver_sql(str(compiled), rows[start : start + BATCH_SIZE])
+
+
+def _timestamps(values: np.ndarray, dialect: str) -> list:
+    if dialect == "sqlite":
+        # The format SQLAlchemy stores and parses back
+        return np.char.replace(
+            np.datetime_as_string(values, unit="us"), "T", " "
+        ).tolist()
+    return values.astype(datetime).tolist()
+
+
+def generate(
+    session: Session,
+    flats: int,
+    users: int = 4,
+    items: int = 20,
+    transactions: int = 100,
+    exclusion_rate: float = 0.1,
+    seed: int = 0,
+    today: date | None = None,
+    hashed_password: str | None = None,
+) -> SeedReport:
+    """Adds `flats` flats with `users` members, `items` items and `transactions` transactions each.
+
+    Each member is left out of each item with probability `exclusion_rate`, items always keep an owner.
+    Pass `hashed_password` to reuse a hash of `PASSWORD` already computed. The caller commits."""
+    generator = np.random.default_rng(seed)
+    dialect = session.get_bind().dialect.name
+    today = today or datetime.now(timezone.utc).date()
+    hashed_password = hashed_password or hash_password(PASSWORD)
+    flat_id = _next_id(session, Flat)
+    user_id = _next_id(session, User)
+    item_id = _next_id(session, Item)
+    report = SeedReport()
+    flat_rows: list[dict] = []
+    user_rows: list[dict] = []
+    item_rows: list[dict] = []
+    ownership_rows: list[dict] = []
+    transaction_rows: list[tuple] = []
+
+    def flush():
+        # Parents first, for the foreign keys
+        for model, rows in (
+            (Flat, flat_rows),
+            (User, user_rows),
+            (Item, item_rows),
+            (UserItems, ownership_rows),
+        ):
+            _write(session, model, rows)
+        _write_transactions(session, transaction_rows)
+        apply_transactions(
+            session,
+            [
+                dict(zip(TRANSACTION_COLUMNS[:4], row))
+                for row in transaction_rows
+                if not row[4]
+            ],
+        )
+        report.flats.extend(row["id"] for row in flat_rows)
+        report.users += len(user_rows)
+        report.items += len(item_rows)
+        report.transactions += len(transaction_rows)
+        for rows in (
+            flat_rows,
+            user_rows,
+            item_rows,
+            ownership_rows,
+            transaction_rows,
+        ):
+            rows.clear()
+
+    for _ in range(flats):
+        flat_rows.append({"id": flat_id, "name": f"Flat {flat_id}"})
+        member_ids = list(range(user_id, user_id + users))
+        for member_id in member_ids:
+            first_name = FIRST_NAMES[generator.integers(len(FIRST_NAMES))]
+            last_name = LAST_NAMES[generator.integers(len(LAST_NAMES))]
+            user_rows.append(
+                {
+                    "id": member_id,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "email": f"{first_name}.{last_name}.{member_id}@example.com".lower(),
+                    "flat_id": flat_id,
+                    "hashed_password": hashed_password,
+                }
+            )
+        user_id += users
+
+        # Owners of the items shared by at least two members, and their purchase dates
+        shared_owners = np.zeros((items, users), dtype=np.int64)
+        shared_counts = []
+        shared_ids = []
+        shared_dates = []
+        for _ in range(items):
+            name, price, depreciation = ITEMS[generator.integers(len(ITEMS))]
+            purchase_date = today - timedelta(days=int(generator.integers(30, 5 * 365)))
+            item_rows.append(
+                {
+                    "id": item_id,
+                    "name": name,
+                    "flat_id": flat_id,
+                    "is_bill": False,
+                    "initial_value": round(price * generator.uniform(0.5, 1.5), 2),
+                    "purchase_date": purchase_date,
+                    "yearly_depreciation": depreciation,
+                    "minimum_value": None,
+                    "minimum_value_pct": [None, 0.1, 0.2][generator.integers(3)],
+                }
+            )
+            owners = [
+                member_id
+                for member_id in member_ids
+                if generator.random() >= exclusion_rate
+            ] or [member_ids[generator.integers(users)]]
+            ownership_rows.extend(
+                {"user_id": owner_id, "item_id": item_id} for owner_id in owners
+            )
+            if len(owners) > 1:
+                shared_owners[len(shared_ids), : len(owners)] = owners
+                shared_counts.append(len(owners))
+                shared_ids.append(item_id)
+                shared_dates.append(purchase_date)
+            item_id += 1
+
+        if shared_ids and transactions:
+            counts = np.array(shared_counts)
+            picks = generator.integers(len(shared_ids), size=transactions)
+            # Two distinct owners of the picked item
+            creditors = generator.integers(counts[picks])
+            debtors = generator.integers(counts[picks] - 1)
+            debtors += debtors >= creditors
+            purchase_dates = np.array(shared_dates, dtype="datetime64[D]")[picks]
+            ages = (np.datetime64(today, "D") - purchase_dates).astype(np.int64)
+            created_at = (
+                purchase_dates
+                + generator.integers(ages + 1)
+                + generator.integers(8 * 60, 23 * 60, size=transactions).astype(
+                    "timedelta64[m]"
+                )
+            ).astype("datetime64[us]")
+            timestamps = _timestamps(created_at, dialect)
+            transaction_rows.extend(
+                zip(
+                    shared_owners[picks, creditors].tolist(),
+                    shared_owners[picks, debtors].tolist(),
+                    np.array(shared_ids)[picks].tolist(),
+                    np.round(generator.uniform(1, 150, size=transactions), 2).tolist(),
+                    (generator.random(transactions) < 0.5).tolist(),
+                    timestamps,
+                    timestamps,
+                )
+            )
+
+        flat_id += 1
+        if len(transaction_rows) >= BATCH_SIZE:
+            flush()
+
+    flush()
+    if dialect == "postgresql":
+        # The ids were assigned here, so the sequences have to catch up
+        for table in ("flat", "user", "item"):
+            session.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f'(SELECT MAX(id) FROM "{table}"))'
+                )
+            )
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import time as timer
+
+    from src.utils import create_db_and_tables, engine
+
+    parser = argparse.ArgumentParser(
+        description="Seed the database with synthetic flats"
+    )
+    parser.add_argument("--flats", type=int, default=10)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=100)
+    parser.add_argument("--exclusion-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    start = timer.perf_counter()
+    with Session(engine) as session:
+        report = generate(
+            session,
+            args.flats,
+            args.users,
+            args.items,
+            args.transactions,
+            args.exclusion_rate,
+            args.seed,
+        )
+        session.commit()
+    print(
+        f"Seeded {len(report.flats)} flats, {report.users} users, {report.items} items "
+        f"and {report.transactions} transactions in {timer.perf_counter() - start:.1f} s"
+    )
@@ -0,0 +1,69 @@
+"""Settles the open debts of a flat with as few transfers as possible.
+
+The plan is computed from the net position of every user in `Balance`, so its cost depends on the number
+of flat members and not on the number of unpaid transactions. Repeatedly matching the largest debtor with
+the largest creditor settles at least one of them per transfer, so `n` users never need more than `n - 1`
+transfers."""
+
+import heapq
+
+from sqlmodel import Session, col, select
+
+from src import ledger
+from src.balances import TOLERANCE
+from src.models import Balance, Item, SettlementTransfer, Transaction
+
+
+def simplify(net: dict[int, float]) -> list[SettlementTransfer]:
+    """Transfers that bring every net position to zero. Positive positions are owed money."""
+    # heapq is a min-heap, so amounts are negated. Ties go to the lowest user id.
+    creditors = [
+        (-amount, user_id) for user_id, amount in net.items() if amount > TOLERANCE
+    ]
+    debtors = [
+        (amount, user_id) for user_id, amount in net.items() if amount < -TOLERANCE
+    ]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    transfers = []
+    while creditors and debtors:
+        credit, creditor_id = heapq.heappop(creditors)
+        debt, debtor_id = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append(
+            SettlementTransfer(
+                debtor_id=debtor_id, creditor_id=creditor_id, amount=amount
+            )
+        )
+        if -credit - amount > TOLERANCE:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+        if -debt - amount > TOLERANCE:
+            heapq.heappush(debtors, (debt + amount, debtor_id))
+    return transfers
+
+
+def net_positions(
+    session: Session, flat_id: int, lock: bool = False
+) -> dict[int, float]:
+    statement = select(Balance).where(Balance.flat_id == flat_id)
+    if lock:
+        # Writers upsert these rows, so they wait until the settlement commits
+        statement = statement.with_for_update()
+    return {
+        balance.user_id: balance.credit - balance.debt
+        for balance in session.exec(statement)
+    }
+
+
+def plan_settlement(session: Session, flat_id: int) -> list[SettlementTransfer]:
+    return simplify(net_positions(session, flat_id))
+
+
+def settle_flat(session: Session, flat_id: int) -> tuple[list[SettlementTransfer], int]:
+    """Plans the settlement of a flat and marks all its unpaid transactions as paid.
+
+    Returns the transfers and the number of transactions settled. The caller commits."""
+    transfers = simplify(net_positions(session, flat_id, lock=True))
+    flat_items = select(Item.id).where(Item.flat_id == flat_id)
+    rows = ledger.set_paid(session, True, col(Transaction.item_id).in_(flat_items))
+    return transfers, len(rows)
@@ -20,3 +20,10 @@ def update_timestamp(session, _flush_context, _instances):
     for obj in session.dirty:
         if isinstance(obj, SQLModel) and hasattr(obj, "updated_at"):
             obj.updated_at = datetime.now(timezone.utc)
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored without a timezone, so aware datetimes are converted to naive UTC."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -1,11 +1,117 @@
+import os
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import SQLModel, Session, create_engine
-import bcrypt
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.migrations import run_migrations
+from src.profiler import profile_queries
 
 sqlite_file_name = "database.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
-connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args, echo=False)
+database_url = os.getenv("DATABASE_URL", sqlite_url)
+# Defaults to a separate pool on the main database
+read_database_url = os.getenv("DATABASE_READ_URL", database_url)
+
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "true").lower() == "true"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Negative sizes are in KiB
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),
+    "temp_store": "MEMORY",
+}
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """Swaps the driver of a database URL for its async counterpart."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {url}")
+    return parsed.set(
+        drivername=ASYNC_DRIVERS[parsed.get_backend_name()]
+    ).render_as_string(hide_password=False)
+
+
+def engine_options(url: str) -> dict[str, Any]:
+    """Connection pool settings from the environment. Pool sizes only apply to server databases."""
+    options: dict[str, Any] = {
+        "echo": False,
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        options["pool_size"] = int(os.getenv("DB_POOL_SIZE", "5"))
+        options["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        options["pool_timeout"] = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    return options
+
+
+def apply_sqlite_profile(engine: Engine, read_only: bool = False):
+    """Sets `SQLITE_PRAGMAS` on every new connection of a SQLite engine.
+
+    A `read_only` engine refuses writes and leaves the journal mode to the writers."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            if read_only and name == "journal_mode":
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+engine = create_engine(database_url, **engine_options(database_url))
+read_engine = create_engine(read_database_url, **engine_options(read_database_url))
+if SQLITE_PROFILE:
+    apply_sqlite_profile(engine)
+    apply_sqlite_profile(read_engine, read_only=True)
+profile_queries(engine)
+profile_queries(read_engine)
+
+_async_engine: AsyncEngine | None = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """The async engine is created on first use, so its driver is only needed by apps that use it."""
+    global _async_engine
+    if _async_engine is None:
+        url = os.getenv("ASYNC_DATABASE_URL") or async_database_url(database_url)
+        _async_engine = create_async_engine(url, **engine_options(url))
+        if SQLITE_PROFILE:
+            apply_sqlite_profile(_async_engine.sync_engine)
+        profile_queries(_async_engine.sync_engine)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+def engines() -> dict[str, Engine]:
+    """Every engine created so far, by role."""
+    created = {"write": engine, "read": read_engine}
+    if _async_engine is not None:
+        created["async"] = _async_engine.sync_engine
+    return created
 
 
 def get_session():
@@ -13,18 +119,21 @@ def get_session():
         yield session
 
 
-def fake_hash(_password: str) -> str:
-    return "pw"
+def get_read_session():
+    """Session for read-only endpoints, from its own connection pool."""
+    with Session(read_engine) as session:
+        yield session
 
 
-def hash_password(password: str) -> str:
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    return hashed_pw.decode()
+async def get_async_session():
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
 
 
-def check_hash(password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(password.encode(), hashed_password.encode())
+def fake_hash(_password: str) -> str:
+    return "pw"
 
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
@@ -0,0 +1,110 @@
+"""Values every item of a flat at a date, and what each owner's share of them is worth.
+
+One query loads the depreciation fields of the items with their owner ids aggregated into a string, and
+`depreciate_prices` prices every item at once. Each owner holds an equal part of an item, as in the
+buy-in and buy-out amounts. Items bought after the date are left out."""
+
+from collections import defaultdict
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import String, cast, func
+from sqlmodel import Session, col, select
+
+from src.depreciation import depreciate_prices
+from src.models import FlatValuation, Item, UserItems
+
+
+def valuation_statement(flat_id: int, when: date | None = None):
+    """One row per item bought by `when`, or every item without it, with its depreciation fields and
+    its owner ids, comma separated."""
+    owner_ids = (
+        select(
+            UserItems.item_id,
+            func.aggregate_strings(cast(UserItems.user_id, String), ",").label(
+                "owner_ids"
+            ),
+        )
+        .join(Item, col(Item.id) == UserItems.item_id)
+        .where(Item.flat_id == flat_id)
+        .group_by(col(UserItems.item_id))
+        .subquery()
+    )
+    statement = (
+        select(
+            Item.id,
+            Item.name,
+            Item.initial_value,
+            Item.purchase_date,
+            Item.yearly_depreciation,
+            Item.minimum_value,
+            Item.minimum_value_pct,
+            owner_ids.c.owner_ids,
+        )
+        .outerjoin(owner_ids, owner_ids.c.item_id == Item.id)
+        .where(Item.flat_id == flat_id)
+        .order_by(col(Item.id))
+    )
+    if when is not None:
+        statement = statement.where(col(Item.purchase_date) <= when)
+    return statement
+
+
+class FlatItems(NamedTuple):
+    """Columns of the items of a flat, in id order."""
+
+    ids: tuple[int, ...]
+    names: tuple[str, ...]
+    # Initial value, purchase date, yearly depreciation and both floors, as taken by `depreciate_prices`
+    depreciation_fields: list[tuple]
+    owners: list[list[int]]
+
+
+def load_flat_items(
+    session: Session, flat_id: int, when: date | None = None
+) -> FlatItems | None:
+    """The items of a flat bought by `when`, or all of them, with their owners, or None when there
+    are none."""
+    rows = session.connection().execute(valuation_statement(flat_id, when)).all()
+    if not rows:
+        return None
+    item_ids, names, *depreciation_fields, owner_lists = zip(*rows)
+    owners = [
+        sorted(map(int, owner_list.split(","))) if owner_list else []
+        for owner_list in owner_lists
+    ]
+    return FlatItems(item_ids, names, depreciation_fields, owners)
+
+
+def value_flat(session: Session, flat_id: int, when: date) -> FlatValuation:
+    items = load_flat_items(session, flat_id, when)
+    if items is None:
+        return FlatValuation(flat_id=flat_id, date=when)
+
+    item_ids, names, depreciation_fields, owners = items
+    values = depreciate_prices(*depreciation_fields, [when])[:, 0]
+    counts = np.array([len(item_owners) for item_owners in owners])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        parts = (values / counts).tolist()
+
+    shares: dict[int, float] = defaultdict(float)
+    for item_owners, part in zip(owners, parts):
+        for user_id in item_owners:
+            shares[user_id] += part
+    return FlatValuation(
+        flat_id=flat_id,
+        date=when,
+        total=float(values.sum()),
+        # Validated from dicts in one go, much faster than building thousands of models
+        items=[
+            {"item_id": item_id, "name": name, "value": value, "owner_ids": ids}
+            for item_id, name, value, ids in zip(
+                item_ids, names, values.tolist(), owners
+            )
+        ],
+        shares=[
+            {"user_id": user_id, "value": value}
+            for user_id, value in sorted(shares.items())
+        ],
+    )
@@ -2,13 +2,29 @@ from datetime import datetime
 
 import pytest
 from fastapi.testclient import TestClient
+from httpx import Response
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
 
-from src.authentication import get_current_user
+from src import profiler
+from src.authentication import (
+    get_current_reader,
+    get_current_user,
+    get_verified_user,
+)
 from src.main import app
 from src.models import Flat, Item, User
-from src.utils import get_session
+from src.principals import principal_cache
+from src.quotes import quote_cache
+from src.schedules import depreciation_schedules
+from src.utils import get_read_session, get_session
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """The caches outlive a test, while every test database reuses the same ids."""
+    for cache in (principal_cache, depreciation_schedules, quote_cache):
+        cache.clear()
 
 
 @pytest.fixture(name="session")
@@ -17,6 +33,7 @@ def session_fixture():
         "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
     )
     SQLModel.metadata.create_all(engine)
+    profiler.profile_queries(engine)
     with Session(engine) as session:
         yield session
 
@@ -30,13 +47,28 @@ def client_fixture(session: Session, user_1: User):
         return user_1
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
     app.dependency_overrides[get_current_user] = get_current_user_override
+    app.dependency_overrides[get_current_reader] = get_current_user_override
+    app.dependency_overrides[get_verified_user] = get_current_user_override
 
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def query_budget(monkeypatch: pytest.MonkeyPatch):
+    """Asserts that a response took at most `budget` SQL statements."""
+    monkeypatch.setattr(profiler, "QUERY_DEBUG", True)
+
+    def check(response: Response, budget: int):
+        count = int(response.headers[profiler.QUERY_COUNT_HEADER])
+        assert count <= budget, f"{count} statements, budget is {budget}"
+
+    return check
+
+
 @pytest.fixture
 def user_1():
     user = User(
@@ -0,0 +1,144 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+
+from src.authentication import create_access_token, resolve_principal
+from src.main import app
+from src.models import Flat, User
+from src.principals import Principal, principal_cache
+from src.utils import get_read_session, get_session
+
+
+def authenticate(session: Session, token: str) -> Principal:
+    return resolve_principal(session, token, None)
+
+
+def test_get_current_user_cached(session: Session, user_1: User):
+    session.add(user_1)
+    session.commit()
+    token = create_access_token({"sub": user_1.email})
+
+    authenticate(session, token)
+    hits = principal_cache.hits
+
+    statements = []
+    engine = session.get_bind()
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        user = authenticate(session, token)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert user == Principal(id=user_1.id, email=user_1.email, flat_id=None)
+    assert principal_cache.hits == hits + 1
+    assert statements == []
+
+
+def test_get_current_user_invalidated_on_update(session: Session, user_1: User):
+    session.add(user_1)
+    session.commit()
+    token = create_access_token({"sub": user_1.email})
+
+    authenticate(session, token)
+    user_1.flat_id = 3
+    session.commit()
+
+    misses = principal_cache.misses
+    user = authenticate(session, token)
+    assert principal_cache.misses == misses + 1
+    assert user.flat_id == 3
+
+
+def test_requests_authenticate_with_a_jwt(tmp_path, user_1: User, user_2: User):
+    """Runs the real `get_current_user`, on the same session as the handler."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    SQLModel.metadata.create_all(engine)
+    sessions: list[Session] = []
+
+    def get_session_override():
+        with Session(engine) as session:
+            sessions.append(session)
+            yield session
+
+    with Session(engine) as session:
+        flat = Flat(name="Olympus", users=[user_1])
+        other_flat = Flat(name="Elsewhere", users=[user_2])
+        session.add_all([flat, other_flat])
+        session.commit()
+        flat_id, other_flat_id, user_id = flat.id, other_flat.id, user_1.id
+
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    try:
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'y.w@g.c'})}"}
+
+        assert client.get(f"/flats/{flat_id}").status_code == 401
+        for _ in range(2):  # A cache miss, then a hit
+            sessions.clear()
+            response = client.get(f"/flats/{flat_id}", headers=headers)
+            assert response.status_code == 200
+            assert len(sessions) == 1
+            assert (
+                client.get(f"/flats/{other_flat_id}", headers=headers).status_code
+                == 401
+            )
+        me = client.get("/me", headers=headers).json()
+        assert (me["id"], me["flat_id"]) == (user_id, flat_id)
+
+        principal_cache.clear()
+        sessions.clear()
+        response = client.patch(
+            f"/users/{user_id}", json={"first_name": "Y"}, headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["first_name"] == "Y"
+        assert len(sessions) == 1
+
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'x@g.c'})}"}
+        assert client.get(f"/flats/{flat_id}", headers=headers).status_code == 401
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_money_moving_writes_ignore_stale_principals(tmp_path, user_1: User):
+    """Another worker moved the user out: reads trust the cached flat until it expires, moves do not."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    SQLModel.metadata.create_all(engine)
+
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    with Session(engine) as session:
+        session.add(user_1)
+        session.commit()
+        user_id, email = user_1.id, user_1.email
+        flat = Flat(name="Olympus")
+        session.add(flat)
+        session.commit()
+        flat_id = flat.id
+    principal_cache.put(
+        email,
+        Principal(id=user_id, email=email, flat_id=flat_id),
+        principal_cache.generation,
+    )
+
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    try:
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+        assert client.get(f"/flats/{flat_id}", headers=headers).status_code == 200
+        operation = {"op": "move_out", "user_id": user_id, "date": "2025-06-01"}
+        response = client.post(f"/flats/{flat_id}/settlement", headers=headers)
+        assert response.status_code == 401
+        response = client.post(
+            f"/flats/{flat_id}/batch", json={"operations": [operation]}, headers=headers
+        )
+        assert response.status_code == 401
+        assert principal_cache.get(email).flat_id is None
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,191 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from src import balances, ledger
+from src.buy_out import item_buy_out
+from src.models import Balance, Flat, Item, PairBalance, Transaction, User
+
+
+def test_balances_follow_moves_and_payments(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    new_user = User(first_name="New", last_name="User", email="n.u@g.c")
+    session.add(new_user)
+    session.commit()
+    date = datetime.strptime("2026-06-01", "%Y-%m-%d").date()
+
+    ledger.move_in(session, flat, new_user, date, [])
+    new_user.flat_id = flat.id
+    session.commit()
+    session.refresh(item)
+    item_buy_out(session, user_2, item, date)
+    session.commit()
+    assert balances.check_balances(session) == []
+
+    debt = session.exec(
+        select(Transaction).where(Transaction.debtor_id == new_user.id)
+    ).first()
+    assert debt is not None
+    response = client.patch(f"/transactions/{debt.id}", json={"paid": True})
+    assert response.status_code == 200
+    assert balances.check_balances(session) == []
+
+    response = client.get(f"/users/{new_user.id}/balance")
+    assert response.status_code == 200
+    data = response.json()
+    stored = session.get(Balance, (flat.id, new_user.id))
+    assert stored is not None
+    assert data["debt"] == stored.debt
+    assert data["net"] == stored.credit - stored.debt
+    pair = session.get(PairBalance, (debt.creditor_id, new_user.id))
+    assert pair is not None and pair.amount == 0
+
+
+def test_balance_of_a_user_who_moved_out(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    response = client.post(f"/flats/{flat.id}/move_out/{user_1.id}?date=2026-01-01")
+    assert response.status_code == 200
+    session.refresh(user_1)
+    assert user_1.flat_id is None
+
+    # User 2 bought user 1 out of the TV, half of its 800
+    expected = {"flat_id": flat.id, "user_id": user_1.id, "credit": 400.0}
+    for params in [{}, {"flat_id": flat.id}]:
+        response = client.get(f"/users/{user_1.id}/balance", params=params)
+        assert response.status_code == 200
+        assert response.json().items() >= {**expected, "net": 400.0}.items()
+
+    other_flat = Flat(name="Elsewhere")
+    session.add(other_flat)
+    session.commit()
+    response = client.get(
+        f"/users/{user_2.id}/balance", params={"flat_id": other_flat.id}
+    )
+    assert response.status_code == 401
+
+
+def test_check_balances_reports_drift(
+    session: Session, flat_2_users_item: tuple[Flat, User, User, Item]
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    session.add(
+        Transaction(
+            creditor_id=user_1.id,  # type: ignore
+            debtor_id=user_2.id,  # type: ignore
+            item_id=item.id,  # type: ignore
+            amount=50,
+            paid=False,
+        )
+    )
+    session.commit()
+
+    differences = balances.check_balances(session)
+    assert {difference["table"] for difference in differences} == {
+        "balance",
+        "pairbalance",
+    }
+    balances.rebuild_balances(session)
+    session.commit()
+    assert balances.check_balances(session) == []
+    stored = session.get(Balance, (flat.id, user_2.id))
+    assert stored is not None and stored.debt == 50
+
+
+def test_update_transaction_unauthorized(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    other = User(first_name="Other", last_name="User", email="o.u@g.c")
+    session.add(other)
+    session.commit()
+    transaction = Transaction(
+        creditor_id=user_2.id,  # type: ignore
+        debtor_id=other.id,  # type: ignore
+        item_id=item.id,  # type: ignore
+        amount=50,
+        paid=False,
+    )
+    session.add(transaction)
+    session.commit()
+
+    response = client.patch(f"/transactions/{transaction.id}", json={"paid": True})
+    assert response.status_code == 401
+
+
+def test_update_transaction_moves_balances_once(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    item_buy_out(session, user_2, item, datetime(2026, 1, 1).date())
+    session.commit()
+    transaction = session.exec(select(Transaction)).one()
+    assert not transaction.paid
+
+    # A concurrent request marks it paid while this session still holds paid=False
+    ledger.set_paid(session, True, Transaction.id == transaction.id)
+    assert not transaction.paid
+    response = client.patch(f"/transactions/{transaction.id}", json={"paid": True})
+    assert response.status_code == 200
+    assert response.json()["paid"]
+    assert balances.check_balances(session) == []
+
+
+def test_balances_without_an_upsert(
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(balances, "UPSERTS", {})
+    flat, user_1, user_2, item = flat_2_users_item
+    item_buy_out(session, user_2, item, datetime(2026, 1, 1).date())
+    session.commit()
+    assert balances.check_balances(session) == []
+
+    for paid in [True, False]:
+        ledger.set_paid(session, paid, Transaction.item_id == item.id)
+        session.commit()
+        assert balances.check_balances(session) == []
+    stored = session.get(Balance, (flat.id, user_2.id))
+    assert stored is not None and stored.credit == 400
+
+
+def test_set_paid_without_returning(
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    engine = session.get_bind()
+    monkeypatch.setattr(engine.dialect, "update_returning", False)
+    flat, user_1, user_2, item = flat_2_users_item
+    item_buy_out(session, user_2, item, datetime(2026, 1, 1).date())
+    session.commit()
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+
+    count = len(session.exec(select(Transaction)).all())
+    # Marking paid twice changes nothing the second time
+    for paid, changed in [(True, count), (True, 0), (False, count)]:
+        rows = ledger.set_paid(session, paid, Transaction.item_id == item.id)
+        session.commit()
+        assert len(rows) == changed
+        assert balances.check_balances(session) == []
+    event.remove(engine, "before_cursor_execute", listener)
+    assert not any("RETURNING" in statement for statement in statements)
+    stored = session.get(Balance, (flat.id, user_2.id))
+    assert stored is not None and stored.credit == 400
@@ -1,5 +1,9 @@
 from datetime import datetime
-from src.depreciation import depreciate_price
+
+import pytest
+from fastapi.exceptions import HTTPException
+
+from src.depreciation import depreciate_items, depreciate_price, depreciate_prices
 from src.models import Item
 
 
@@ -16,3 +20,40 @@ def test_depreciate_price_min_val(item_2: Item):
 def test_depreciate_price_min_val_pct(item_3: Item):
     date_for_calculation = datetime.strptime("2026-01-01", "%Y-%m-%d").date()
     assert depreciate_price(item_3, date_for_calculation) == 950
+
+
+def test_depreciate_items_matches_scalar(item_1: Item, item_2: Item, item_3: Item):
+    items = [item_1, item_2, item_3]
+    dates = [
+        datetime.strptime(day, "%Y-%m-%d").date()
+        for day in ["2025-01-01", "2025-07-15", "2026-01-01", "2040-06-30"]
+    ]
+    prices = depreciate_items(items, dates)
+    assert prices.shape == (3, 4)
+    for i, item in enumerate(items):
+        for j, day in enumerate(dates):
+            assert prices[i, j] == pytest.approx(depreciate_price(item, day), rel=1e-12)
+
+
+def test_depreciate_items_before_purchase(item_1: Item):
+    date_for_calculation = datetime.strptime("2024-12-31", "%Y-%m-%d").date()
+    with pytest.raises(HTTPException) as error:
+        depreciate_items([item_1], [date_for_calculation])
+    assert error.value.status_code == 400
+
+
+def test_depreciate_prices_before_purchase_price(item_1: Item):
+    dates = [
+        datetime.strptime(day, "%Y-%m-%d").date()
+        for day in ["2024-12-31", "2026-01-01"]
+    ]
+    prices = depreciate_prices(
+        [item_1.initial_value],
+        [item_1.purchase_date],
+        [item_1.yearly_depreciation],
+        [item_1.minimum_value],
+        [item_1.minimum_value_pct],
+        dates,
+        before_purchase=0.0,
+    )
+    assert prices.tolist() == [[0.0, pytest.approx(800)]]
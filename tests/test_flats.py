@@ -1,7 +1,16 @@
+import csv
+import io
+import json
+from collections.abc import Callable
+from datetime import date
+
+import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from httpx import Response
+from sqlmodel import Session, select
 
-from src.models import Flat, Item, User
+from src import balances, export, profiler
+from src.models import Flat, Item, Transaction, User
 
 
 def test_add_flat(client: TestClient, session: Session, user_1: User):
@@ -140,3 +149,404 @@ def test_move_out(
     if not db_flat:
         raise Exception("Couldn't find flat")
     assert db_user_2 not in db_flat.users
+
+
+def test_export_ledger(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+    monkeypatch,
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    for amount in (10, 20, 30):
+        session.add(
+            Transaction(
+                creditor_id=user_1.id,  # type: ignore
+                debtor_id=user_2.id,  # type: ignore
+                item_id=item.id,  # type: ignore
+                amount=amount,
+                paid=False,
+            )
+        )
+    session.commit()
+    monkeypatch.setattr(export, "EXPORT_CHUNK_SIZE", 2)
+
+    response = client.get(f"/flats/{flat.id}/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["amount"] for row in rows] == ["10.0", "20.0", "30.0"]
+    assert rows[0]["debtor_name"] == "Ilias Trichopoulos"
+
+    response = client.get(f"/flats/{flat.id}/export", params={"format": "ndjson"})
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["item_name"] for record in records] == ["TV"] * 3
+
+
+def test_move_in_query_budget(
+    client: TestClient,
+    session: Session,
+    flat_user_item: tuple[Flat, User, Item],
+    user_2: User,
+    query_budget: Callable[[Response, int], None],
+):
+    flat, user_1, item = flat_user_item
+    session.add(user_2)
+    session.commit()
+
+    def move_in_statements() -> int:
+        response = client.post(
+            f"/flats/{flat.id}/move_in/{user_2.id}?date=2026-01-01", json=[]
+        )
+        assert response.status_code == 200
+        query_budget(response, 13)
+        return int(response.headers[profiler.QUERY_COUNT_HEADER])
+
+    single_item = move_in_statements()
+    response = client.post(f"/flats/{flat.id}/move_out/{user_2.id}?date=2026-01-01")
+    assert response.status_code == 200
+    for name in ["Sofa", "Table", "Lamp", "Bed", "Oven"]:
+        session.add(
+            Item(
+                name=name,
+                flat_id=flat.id,
+                is_bill=False,
+                initial_value=100.0,
+                purchase_date=item.purchase_date,
+                yearly_depreciation=0.1,
+                minimum_value=None,
+                minimum_value_pct=None,
+                users=[user_1],
+            )
+        )
+    session.commit()
+
+    # The statements do not grow with the items
+    assert move_in_statements() == single_item
+
+
+def test_flat_valuation(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+    query_budget: Callable[[Response, int], None],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    lamp = Item(
+        name="Lamp",
+        flat_id=flat.id,
+        is_bill=False,
+        initial_value=100.0,
+        purchase_date=item.purchase_date,
+        yearly_depreciation=0.2,
+        minimum_value=None,
+        minimum_value_pct=None,
+        users=[user_1],
+    )
+    # Bought after the valuation date
+    sofa = Item(
+        name="Sofa",
+        flat_id=flat.id,
+        is_bill=False,
+        initial_value=500.0,
+        purchase_date=date(2026, 6, 1),
+        yearly_depreciation=0.1,
+        minimum_value=None,
+        minimum_value_pct=None,
+        users=[user_2],
+    )
+    session.add_all([lamp, sofa])
+    session.commit()
+
+    response = client.get(f"/flats/{flat.id}/valuation?date=2026-01-01")
+    assert response.status_code == 200
+    query_budget(response, 2)
+    data = response.json()
+    assert data["date"] == "2026-01-01"
+    assert [entry["item_id"] for entry in data["items"]] == [item.id, lamp.id]
+    assert data["items"][0]["owner_ids"] == [user_1.id, user_2.id]
+    assert data["items"][0]["value"] == pytest.approx(800)
+    assert data["total"] == pytest.approx(880)
+    assert data["shares"] == [
+        {"user_id": user_1.id, "value": pytest.approx(480)},
+        {"user_id": user_2.id, "value": pytest.approx(400)},
+    ]
+
+    response = client.get(f"/flats/{flat.id + 1}/valuation")
+    assert response.status_code == 401
+
+
+def test_move_quotes_match_moves_and_write_nothing(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+    query_budget: Callable[[Response, int], None],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    new_user = User(first_name="New", last_name="User", email="n.u@g.c")
+    session.add(new_user)
+    session.commit()
+
+    url = f"/flats/{flat.id}/move_in/{new_user.id}/quote?date=2026-01-01"
+    response = client.get(url)
+    assert response.status_code == 200
+    quote = response.json()
+    assert quote["kind"] == "move_in"
+    assert quote["items"] == [
+        {
+            "item_id": item.id,
+            "name": "TV",
+            "price": pytest.approx(800),
+            "amount": pytest.approx((800 / 2 - 800 / 3) * 2),
+        }
+    ]
+    assert [entry["user_id"] for entry in quote["counterparties"]] == [
+        user_1.id,
+        user_2.id,
+    ]
+    assert session.exec(select(Transaction)).all() == []
+
+    # Cached: only the checks of the endpoint run
+    response = client.get(url)
+    query_budget(response, 3)
+    assert response.json() == quote
+    response = client.get(f"{url}&exclude_items={item.id}")
+    assert response.json()["total"] == 0
+
+    client.post(f"/flats/{flat.id}/move_in/{new_user.id}?date=2026-01-01", json=[])
+    debts = session.exec(
+        select(Transaction).where(Transaction.debtor_id == new_user.id)
+    ).all()
+    assert sum(debt.amount for debt in debts) == pytest.approx(quote["total"])
+
+    response = client.get(
+        f"/flats/{flat.id}/move_out/{new_user.id}/quote?date=2026-01-01"
+    )
+    assert response.status_code == 200
+    # Sells their third of the TV back to the other two owners
+    assert response.json()["total"] == pytest.approx(800 / 3)
+
+
+def test_move_quotes_follow_item_edits(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    url = f"/flats/{flat.id}/move_out/{user_2.id}/quote?date=2026-01-01"
+    before = client.get(url).json()["total"]
+
+    client.patch(f"/items/{item.id}", json={"initial_value": 2000.0})
+    assert client.get(url).json()["total"] == pytest.approx(before * 2)
+
+    response = client.get(f"/flats/{flat.id}/move_in/{user_2.id}/quote?date=2026-01-01")
+    assert response.status_code == 400
+
+
+def test_buy_out_forecast(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+    query_budget: Callable[[Response, int], None],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    # Nobody can buy user 1 out of an item they own alone
+    session.add(
+        Item(
+            name="Lamp",
+            flat_id=flat.id,
+            is_bill=False,
+            initial_value=100.0,
+            purchase_date=item.purchase_date,
+            yearly_depreciation=0.2,
+            minimum_value=None,
+            minimum_value_pct=None,
+            users=[user_1],
+        )
+    )
+    session.commit()
+
+    response = client.get(f"/flats/{flat.id}/forecast?years=1&start=2025-12-15")
+    assert response.status_code == 200
+    query_budget(response, 3)
+    data = response.json()
+    assert data["user_ids"] == [user_1.id, user_2.id]
+    assert data["dates"][:2] == ["2025-12-31", "2026-01-31"]
+    assert len(data["dates"]) == 12
+    assert len(data["totals"]) == 2
+
+    quote = client.get(
+        f"/flats/{flat.id}/move_out/{user_2.id}/quote?date=2026-01-31"
+    ).json()
+    assert data["totals"][1][1] == pytest.approx(quote["total"], abs=0.005)
+    assert data["totals"][0] == data["totals"][1]
+    assert data["totals"][0] == sorted(data["totals"][0], reverse=True)
+
+
+def test_buy_out_forecast_counts_items_bought_in_the_window(
+    client: TestClient, flat_2_users_item: tuple[Flat, User, User, Item]
+):
+    flat, _, user_2, _ = flat_2_users_item
+    # The item is bought 2025-01-01, after the first month-end
+    response = client.get(f"/flats/{flat.id}/forecast?years=2&start=2024-11-15")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["dates"][:3] == ["2024-11-30", "2024-12-31", "2025-01-31"]
+    totals = data["totals"][1]
+    assert totals[:2] == [0.0, 0.0]
+    assert all(total > 0 for total in totals[2:])
+
+    quote = client.get(
+        f"/flats/{flat.id}/move_out/{user_2.id}/quote?date=2025-06-30"
+    ).json()
+    assert totals[data["dates"].index("2025-06-30")] == pytest.approx(
+        quote["total"], abs=0.005
+    )
+
+
+def batch_item(name: str, ref: str | None = None) -> dict:
+    return {
+        "op": "add_item",
+        "ref": ref,
+        "name": name,
+        "is_bill": False,
+        "initial_value": 300.0,
+        "purchase_date": "2025-01-01",
+        "yearly_depreciation": 0.0,
+        "minimum_value": None,
+        "minimum_value_pct": None,
+    }
+
+
+def test_batch_onboards_a_flat(
+    client: TestClient,
+    session: Session,
+    flat_and_user_1: tuple[Flat, User],
+    user_2: User,
+    query_budget: Callable[[Response, int], None],
+):
+    flat, user_1 = flat_and_user_1
+    user_3 = User(first_name="New", last_name="User", email="n.u@g.c")
+    session.add_all([user_2, user_3])
+    session.commit()
+
+    operations = [
+        batch_item("TV", "tv"),
+        batch_item("Sofa", "sofa"),
+        {"op": "move_in", "user_id": user_2.id, "date": "2025-06-01"},
+        {
+            "op": "remove_user_from_item",
+            "item_id": "sofa",
+            "user_id": user_2.id,
+            "date": "2025-06-01",
+        },
+        {
+            "op": "move_in",
+            "user_id": user_3.id,
+            "date": "2025-06-01",
+            "exclude_items": ["tv"],
+        },
+    ]
+    response = client.post(f"/flats/{flat.id}/batch", json={"operations": operations})
+    assert response.status_code == 200
+    # Five operations, one transaction
+    query_budget(response, 35)
+    results = response.json()["results"]
+    tv_id, sofa_id = results[0]["item_id"], results[1]["item_id"]
+    assert [result["transactions"] for result in results] == [0, 0, 2, 1, 1]
+
+    session.expire_all()
+    tv, sofa = session.get(Item, tv_id), session.get(Item, sofa_id)
+    assert tv is not None and sofa is not None
+    assert {user.id for user in tv.users} == {user_1.id, user_2.id}
+    assert {user.id for user in sofa.users} == {user_1.id, user_3.id}
+    # User 2 bought half of each item and sold the sofa back, user 3 bought half of the sofa
+    debts = session.exec(select(Transaction)).all()
+    assert sum(t.amount for t in debts if t.debtor_id == user_2.id) == 300
+    assert sum(t.amount for t in debts if t.debtor_id == user_3.id) == 150
+    assert balances.check_balances(session) == []
+
+
+def test_batch_is_atomic(
+    client: TestClient,
+    session: Session,
+    flat_and_user_1: tuple[Flat, User],
+):
+    flat, _ = flat_and_user_1
+    operations = [
+        batch_item("TV"),
+        {"op": "add_user_to_item", "item_id": 999, "user_id": 1, "date": "2025-06-01"},
+    ]
+    response = client.post(f"/flats/{flat.id}/batch", json={"operations": operations})
+    assert response.status_code == 404
+    assert response.json()["detail"] == {"operation": 1, "detail": "Item not found"}
+    assert session.exec(select(Item)).all() == []
+
+
+def test_batch_refuses_what_the_endpoints_refuse(
+    client: TestClient, flat_2_users_item: tuple[Flat, User, User, Item]
+):
+    flat, user_1, _, item = flat_2_users_item
+    requests = [
+        (
+            {"op": "move_in", "user_id": user_1.id, "date": "2026-01-01"},
+            lambda: client.post(
+                f"/flats/{flat.id}/move_in/{user_1.id}?date=2026-01-01", json=[]
+            ),
+        ),
+        (
+            {
+                "op": "add_user_to_item",
+                "item_id": item.id,
+                "user_id": user_1.id,
+                "date": "2026-01-01",
+            },
+            lambda: client.patch(f"/items/{item.id}/add/{user_1.id}?date=2026-01-01"),
+        ),
+    ]
+    for operation, endpoint in requests:
+        response = client.post(
+            f"/flats/{flat.id}/batch", json={"operations": [operation]}
+        )
+        expected = endpoint()
+        assert response.status_code == expected.status_code
+        assert response.json()["detail"]["detail"] == expected.json()["detail"]
+
+
+def test_excluded_items_of_other_flats_are_refused_alike(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, _, _, _ = flat_2_users_item
+    new_user = User(first_name="New", last_name="User", email="n.u@g.c")
+    other_item = Item(
+        name="Lamp",
+        is_bill=False,
+        initial_value=10.0,
+        purchase_date=date(2025, 1, 1),
+        yearly_depreciation=0.2,
+    )
+    session.add_all([new_user, Flat(name="Elsewhere", items=[other_item])])
+    session.commit()
+
+    for item_id, status in ((other_item.id, 401), (999, 404)):
+        operation = {
+            "op": "move_in",
+            "user_id": new_user.id,
+            "date": "2026-01-01",
+            "exclude_items": [item_id],
+        }
+        url = f"/flats/{flat.id}/move_in/{new_user.id}"
+        responses = [
+            client.post(f"/flats/{flat.id}/batch", json={"operations": [operation]}),
+            client.get(f"{url}/quote?date=2026-01-01&exclude_items={item_id}"),
+            client.post(f"{url}?date=2026-01-01", json=[item_id]),
+        ]
+        assert [response.status_code for response in responses] == [status] * 3
+        details = [responses[0].json()["detail"]["detail"]]
+        details += [response.json()["detail"] for response in responses[1:]]
+        assert len(set(details)) == 1
+    session.refresh(new_user)
+    assert new_user.flat_id is None
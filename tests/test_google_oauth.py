@@ -0,0 +1,64 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src import google_oauth
+
+
+def test_cache_lifetime():
+    headers = httpx.Headers({"Cache-Control": "public, max-age=300", "Age": "100"})
+    assert google_oauth.cache_lifetime(headers) == 200
+    assert (
+        google_oauth.cache_lifetime(httpx.Headers({"Cache-Control": "no-store"})) == 0
+    )
+
+
+def test_cert_cache_honors_max_age(monkeypatch: pytest.MonkeyPatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        return httpx.Response(
+            200, json={"key-1": "cert"}, headers={"Cache-Control": "max-age=3600"}
+        )
+
+    async def fetch_twice() -> dict[str, str]:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(google_oauth, "_client", client)
+        cache = google_oauth.CertCache("http://stub/certs")
+        await cache.get()
+        certs = await cache.get()
+        await client.aclose()
+        return certs
+
+    assert asyncio.run(fetch_twice()) == {"key-1": "cert"}
+    assert len(calls) == 1
+
+
+def test_cert_cache_refetches_once_for_unknown_keys(monkeypatch: pytest.MonkeyPatch):
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        await asyncio.sleep(0.01)
+        return httpx.Response(
+            200,
+            json={"key-1": "cert", "key-2": "cert"} if calls[1:] else {"key-1": "cert"},
+            headers={"Cache-Control": "max-age=3600"},
+        )
+
+    async def fetch() -> list[dict[str, str]]:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(google_oauth, "_client", client)
+        cache = google_oauth.CertCache("http://stub/certs")
+        await cache.get()
+        # Rotated key: one refetch serves every waiting request
+        rotated = await asyncio.gather(*(cache.get("key-2") for _ in range(10)))
+        # Bogus keys: no refetch within the minimum interval
+        await asyncio.gather(*(cache.get("bogus") for _ in range(10)))
+        await client.aclose()
+        return rotated
+
+    assert all("key-2" in certs for certs in asyncio.run(fetch()))
+    assert len(calls) == 2
@@ -0,0 +1,21 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.exceptions import HTTPException
+
+from src import hashing
+
+
+def test_hash_round_trip():
+    hashed = hashing.hash_password("pw")
+    assert hashing.check_hash("pw", hashed)
+    assert not asyncio.run(hashing.check_hash_async("other", hashed))
+
+
+def test_hash_queue_full(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(hashing, "_slots", threading.BoundedSemaphore(1))
+    hashing._slots.acquire()
+    with pytest.raises(HTTPException) as error:
+        hashing.hash_password("pw")
+    assert error.value.status_code == 503
@@ -1,6 +1,11 @@
+from collections.abc import Callable
+
 from fastapi.testclient import TestClient
+from httpx import Response
+from sqlalchemy import inspect
 from sqlmodel import Session
 
+from src import queries
 from src.buy_in import item_buy_in
 from src.models import Flat, Item, User
 
@@ -155,3 +160,49 @@ def test_fetch_item_with_transactions(
     data = response.json()
     assert len(data["transactions"]) == 1
     assert data["transactions"][0]["item_id"] == item.id
+
+
+def test_fetch_items_query_count(
+    client: TestClient,
+    query_budget: Callable[[Response, int], None],
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    for name in ["Sofa", "Table", "Lamp"]:
+        session.add(
+            Item(
+                name=name,
+                flat_id=flat.id,
+                is_bill=False,
+                initial_value=100.0,
+                purchase_date=item.purchase_date,
+                yearly_depreciation=0.1,
+                minimum_value=None,
+                minimum_value_pct=None,
+                users=[user_1, user_2],
+            )
+        )
+    session.commit()
+    session.expunge_all()
+
+    response = client.get("/items/")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 4
+    assert all(len(item["users"]) == 2 for item in data)
+    query_budget(response, 2)
+
+
+def test_get_one_loads_the_plan_of_an_item_in_the_session(
+    session: Session, flat_2_users_item: tuple[Flat, User, User, Item]
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    # The item stays in the identity map without its users
+    session.expire(item, ["users"])
+
+    loaded = queries.get_one(session, Item, item.id, queries.ITEM_WITH_USERS)  # type: ignore
+
+    assert loaded is item
+    assert "users" not in inspect(item).unloaded
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+from fastapi.exceptions import HTTPException
+from sqlmodel import Session, select
+
+from src import ledger
+from src.buy_in import item_buy_in
+from src.buy_out import item_buy_out
+from src.models import Flat, Item, Transaction, User
+
+
+def test_buy_in_rows_match_item_buy_in(
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    new_user = User(first_name="New", last_name="User", email="n.u@g.c")
+    session.add(new_user)
+    session.commit()
+    session.refresh(new_user)
+    if flat.id is None or new_user.id is None:
+        raise Exception("Issue creating ids")
+    date = datetime.strptime("2026-06-01", "%Y-%m-%d").date()
+
+    rows = ledger.buy_in_rows(
+        new_user.id, [item], ledger.load_owners(session, flat.id), date
+    )
+    item_buy_in(session, new_user, item, date)
+    session.flush()
+    transactions = session.exec(select(Transaction)).all()
+
+    assert sorted((row["creditor_id"], row["amount"]) for row in rows) == sorted(
+        (transaction.creditor_id, transaction.amount) for transaction in transactions
+    )
+
+
+def test_buy_out_rows_match_item_buy_out(
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    if flat.id is None or user_2.id is None:
+        raise Exception("Issue creating ids")
+    date = datetime.strptime("2026-06-01", "%Y-%m-%d").date()
+
+    rows = ledger.buy_out_rows(
+        user_2.id, [item], ledger.load_owners(session, flat.id), date
+    )
+    item_buy_out(session, user_2, item, date)
+    session.flush()
+    transactions = session.exec(select(Transaction)).all()
+
+    assert [(row["debtor_id"], row["amount"]) for row in rows] == [
+        (transaction.debtor_id, transaction.amount) for transaction in transactions
+    ]
+
+
+def test_move_out_last_owner(session: Session, flat_user_item: tuple[Flat, User, Item]):
+    flat, user, item = flat_user_item
+    date = datetime.strptime("2026-06-01", "%Y-%m-%d").date()
+    with pytest.raises(HTTPException) as error:
+        ledger.move_out(session, flat, user, date)
+    assert error.value.status_code == 500
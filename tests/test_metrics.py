@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+
+from src.metrics import Metrics, metrics, render
+
+
+def test_metrics_endpoint(client: TestClient):
+    metrics.clear()
+    client.get("/users/")
+    client.get("/users/")
+    client.get("/does-not-exist")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert 'http_requests_total{method="GET",route="/users/",status="200"} 2' in lines
+    assert (
+        'http_requests_total{method="GET",route="<unmatched>",status="404"} 1' in lines
+    )
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/users/"} 2' in lines
+    )
+    # The scrape itself is in flight
+    assert "http_requests_in_flight 1" in lines
+    assert any(line.startswith("principal_cache_hits_total ") for line in lines)
+    assert any(line.startswith("depreciation_cache_size ") for line in lines)
+    assert any(line.startswith("log_records_dropped_total ") for line in lines)
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Metrics()
+    registry.observe("GET", "/items/{item_id}", 200, 0.005)
+    registry.observe("GET", "/items/{item_id}", 200, 0.3)
+    registry.observe("GET", "/items/{item_id}", 200, 60)
+
+    lines = render(registry, {}, {}, 0).splitlines()
+    bucket = (
+        'http_request_duration_seconds_bucket{method="GET",route="/items/{item_id}",'
+    )
+    assert f'{bucket}le="0.005"}} 1' in lines
+    assert f'{bucket}le="0.25"}} 1' in lines
+    assert f'{bucket}le="0.5"}} 2' in lines
+    assert f'{bucket}le="+Inf"}} 3' in lines
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from src import logger, profiler
+from src.middleware import AccessLogMiddleware, parse_sample_rates
+
+
+def make_client(sample_rates: dict[str, float]) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(AccessLogMiddleware, sample_rates=sample_rates)
+
+    @app.get("/things/{thing_id}")
+    def fetch_thing(thing_id: int):
+        return {"id": thing_id}
+
+    @app.get("/broken")
+    def broken():
+        raise HTTPException(status_code=503)
+
+    return TestClient(app)
+
+
+def access_records(caplog: pytest.LogCaptureFixture) -> list[dict]:
+    return [json.loads(record.getMessage()) for record in caplog.records]
+
+
+def test_access_log_records_template_status_and_duration(
+    caplog: pytest.LogCaptureFixture,
+):
+    client = make_client({})
+    with caplog.at_level(logging.INFO, logger="fastapi"):
+        client.get("/things/3")
+        client.get("/missing")
+
+    first, second = access_records(caplog)
+    assert first["url"] == "/things/{thing_id}"
+    assert first["method"] == "GET"
+    assert first["status"] == 200
+    assert first["duration_ms"] >= 0
+    assert second["url"] == "/missing"
+    assert second["status"] == 404
+
+
+def test_access_log_sampling_keeps_server_errors(caplog: pytest.LogCaptureFixture):
+    client = make_client({"GET /things/{thing_id}": 0.0, "/broken": 0.0})
+    with caplog.at_level(logging.INFO, logger="fastapi"):
+        client.get("/things/3")
+        client.get("/broken")
+
+    assert [record["url"] for record in access_records(caplog)] == ["/broken"]
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("GET /users/=0.1, /items/{item_id}=0.5") == {
+        "GET /users/": 0.1,
+        "/items/{item_id}": 0.5,
+    }
+
+
+def test_slow_requests_are_logged(
+    client: TestClient,
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(profiler, "SLOW_REQUEST_QUERIES", 0)
+    with caplog.at_level(logging.WARNING, logger="fastapi"):
+        client.get("/users/")
+
+    (record,) = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert record.url == "/users/"
+    assert record.queries >= 1
+
+
+def test_importing_starts_no_log_writer(tmp_path):
+    code = (
+        "import threading, src.main, src.seed, src.migrate; "
+        "assert threading.active_count() == 1, threading.enumerate()"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parent.parent,
+        env={**os.environ, "LOG_FILE": str(tmp_path / "app.log")},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_log_writer_writes_one_file(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(logger, "LOG_FILE", str(tmp_path / "app.log"))
+    logger.start_logging()
+    try:
+        logger.logger.info("hello")
+    finally:
+        logger.stop_logging()
+        logger.logger.handlers = []
+    assert [path.name for path in tmp_path.iterdir()] == ["app.log"]
+    assert "hello" in (tmp_path / "app.log").read_text()
+
+
+FORKED_WRITERS = """
+import os, sys
+from src import logger
+
+logger.start_logging()
+children = []
+for writer in range(2):
+    pid = os.fork()
+    if pid == 0:
+        for record in range(5000):
+            logger.logger.info("writer %d record %d", writer, record)
+        sys.exit(0)
+    children.append(pid)
+for pid in children:
+    assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+"""
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_writers_lose_no_records(tmp_path):
+    env = {
+        **os.environ,
+        "LOG_FILE": str(tmp_path / "app.log"),
+        "LOG_MAX_BYTES": "4096",
+        "LOG_BACKUP_COUNT": "1000",
+    }
+    env.pop("LOG_PER_WORKER", None)
+    result = subprocess.run(
+        [sys.executable, "-c", FORKED_WRITERS],
+        cwd=Path(__file__).parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    lines = [
+        line for path in tmp_path.iterdir() for line in path.read_text().splitlines()
+    ]
+    for writer in range(2):
+        records = {line for line in lines if f"writer {writer} record" in line}
+        assert len(records) == 5000
+
+
+def test_failing_statements_do_not_skew_query_times():
+    engine = create_engine("sqlite://")
+    profiler.profile_queries(engine)
+    stats = profiler.QueryStats()
+    token = profiler.current_stats.set(stats)
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM missing")
+            time.sleep(0.2)
+            connection.exec_driver_sql("SELECT 1")
+            assert "query_start" not in connection.info
+    finally:
+        profiler.current_stats.reset(token)
+    assert stats.count == 2
+    assert stats.seconds < 0.1
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from sqlalchemy import inspect
+from sqlmodel import SQLModel, create_engine, select
+
+from src.migrations import MIGRATIONS, run_migrations
+from src.models import Item, Transaction
+
+
+def test_migrations_add_indexes_to_existing_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "DROP INDEX ix_transaction_debtor_id_paid_created_at_id"
+        )
+        connection.exec_driver_sql("DROP INDEX ix_item_flat_id")
+
+    assert run_migrations(engine) == [version for version, _, _ in MIGRATIONS]
+    assert run_migrations(engine) == []
+    indexes = {index["name"] for index in inspect(engine).get_indexes("transaction")}
+    assert "ix_transaction_debtor_id_paid_created_at_id" in indexes
+    assert "ix_transaction_debtor_id_paid" not in indexes
+    indexes = {index["name"] for index in inspect(engine).get_indexes("item")}
+    assert "ix_item_flat_id" in indexes
+
+
+def test_query_plans_use_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    SQLModel.metadata.create_all(engine)
+
+    def plan(statement) -> str:
+        compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+        with engine.connect() as connection:
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")
+            return " ".join(row[-1] for row in rows)
+
+    debts = select(Transaction).where(
+        Transaction.debtor_id == 1,
+        Transaction.paid == False,  # noqa: E712
+    )
+    assert "ix_transaction_debtor_id_paid_created_at_id" in plan(debts)
+    items = select(Item).where(Item.flat_id == 1)
+    assert "ix_item_flat_id" in plan(items)
+
+
+def test_migrate_cli(tmp_path):
+    database = tmp_path / "cli.db"
+    result = subprocess.run(
+        [sys.executable, "-m", "src.migrate"],
+        cwd=Path(__file__).parent.parent,
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{database}"},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert f"schema version {len(MIGRATIONS)}" in result.stdout
+
+    engine = create_engine(f"sqlite:///{database}")
+    assert run_migrations(engine) == []
+    assert "ix_item_flat_id" in {
+        index["name"] for index in inspect(engine).get_indexes("item")
+    }
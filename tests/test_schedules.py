@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from src.depreciation import depreciate_price
+from src.models import Flat, Item, User
+from src.schedules import DepreciationSchedules, depreciation_schedules
+
+
+def test_schedules_match_depreciate_price(item_1: Item, item_2: Item, item_3: Item):
+    items = [item_1, item_2, item_3]
+    for item_id, item in enumerate(items, start=1):
+        item.id = item_id
+    schedules = DepreciationSchedules(max_size=100, block_days=30)
+
+    for days in (0, 1, 29, 30, 400, 3000):
+        when = item_1.purchase_date + timedelta(days=days)
+        expected = [depreciate_price(item, when) for item in items]
+        assert schedules.prices(items, when) == pytest.approx(expected, rel=1e-12)
+    # Days 1 and 29 fall in the block of day 0
+    assert schedules.stats() == {"hits": 6, "misses": 12, "size": 12}
+
+
+def test_schedules_evict_least_recently_used(item_1: Item, item_2: Item):
+    item_1.id, item_2.id = 1, 2
+    schedules = DepreciationSchedules(max_size=2, block_days=30)
+    day = item_1.purchase_date
+    schedules.price(item_1, day)
+    schedules.price(item_2, day)
+    schedules.price(item_1, day)
+    # Evicts the block of item 2, used less recently
+    schedules.price(item_1, day + timedelta(days=40))
+    schedules.price(item_1, day)
+
+    assert schedules.stats() == {"hits": 2, "misses": 3, "size": 2}
+    schedules.price(item_2, day)
+    assert schedules.misses == 4
+
+
+def test_schedules_never_price_from_edited_fields(item_1: Item):
+    item_1.id = 1
+    schedules = DepreciationSchedules(max_size=10, block_days=30)
+    day = item_1.purchase_date + timedelta(days=365)
+    assert schedules.price(item_1, day) == pytest.approx(800)
+
+    item_1.initial_value = 2000.0
+    assert schedules.price(item_1, day) == pytest.approx(1600)
+
+
+def test_update_item_invalidates_schedules(
+    client: TestClient,
+    session: Session,
+    flat_user_item: tuple[Flat, User, Item],
+):
+    _, _, item = flat_user_item
+    day = date(2026, 1, 1)
+    depreciation_schedules.price(item, day)
+    key = (
+        item.id,
+        (day - item.purchase_date).days // depreciation_schedules.block_days,
+    )
+    assert key in depreciation_schedules._blocks
+
+    response = client.patch(f"/items/{item.id}", json={"yearly_depreciation": 0.5})
+    assert response.status_code == 200
+    assert key not in depreciation_schedules._blocks
+
+    depreciation_schedules.price(item, day)
+    client.patch(f"/items/{item.id}", json={"name": "Television"})
+    assert key in depreciation_schedules._blocks
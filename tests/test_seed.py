@@ -0,0 +1,90 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, func, select
+
+from src import balances, seed
+from src.models import Flat, Item, Transaction, User
+from src.principals import principal_cache
+from src.quotes import quote_cache
+from src.schedules import depreciation_schedules
+
+
+def test_generate_builds_consistent_flats(session: Session):
+    report = seed.generate(
+        session,
+        flats=3,
+        users=4,
+        items=5,
+        transactions=50,
+        today=date(2026, 1, 1),
+        hashed_password="hash",
+    )
+    session.commit()
+
+    assert len(report.flats) == 3
+    assert (report.users, report.items, report.transactions) == (12, 15, 150)
+    assert session.exec(select(func.count()).select_from(Transaction)).one() == 150
+    for transaction in session.exec(select(Transaction)).all():
+        owner_ids = {user.id for user in transaction.item.users}
+        assert transaction.creditor_id != transaction.debtor_id
+        assert {transaction.creditor_id, transaction.debtor_id} <= owner_ids
+        assert transaction.created_at.date() >= transaction.item.purchase_date
+    for item in session.exec(select(Item)).all():
+        assert item.users
+        assert {user.flat_id for user in item.users} == {item.flat_id}
+    assert balances.check_balances(session) == []
+
+
+def test_generate_is_deterministic(session: Session):
+    seed.generate(session, flats=1, transactions=20, seed=7, hashed_password="hash")
+    first = session.exec(
+        select(Transaction.creditor_id, Transaction.debtor_id, Transaction.amount)
+    ).all()
+    seed.generate(session, flats=1, transactions=20, seed=7, hashed_password="hash")
+    second = session.exec(
+        select(
+            Transaction.creditor_id, Transaction.debtor_id, Transaction.amount
+        ).where(Transaction.id > len(first))
+    ).all()
+
+    # Same data, shifted by the ids of the first flat
+    offset = 4
+    assert [(c + offset, d + offset, a) for c, d, a in first] == second
+
+
+def test_reset_seeds_flats(client: TestClient, session: Session):
+    response = client.post(
+        "/reset/", params={"flats": 2, "users": 3, "items": 4, "transactions": 10}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["seeded"]["transactions"] == 20
+
+    # The demo flat and two generated ones, one password hash for everyone
+    assert session.exec(select(func.count()).select_from(Flat)).one() == 3
+    users = session.exec(select(User)).all()
+    assert len(users) == 8
+    assert len({user.hashed_password for user in users}) == 1
+    assert balances.check_balances(session) == []
+
+
+def test_reset_without_parameters_keeps_the_demo_data(
+    client: TestClient, session: Session
+):
+    response = client.post("/reset/")
+    assert response.json() == {"deleted": True}
+    assert session.exec(select(func.count()).select_from(User)).one() == 2
+    assert session.exec(select(func.count()).select_from(Item)).one() == 1
+
+
+def test_reset_clears_the_caches(client: TestClient, item_1: Item):
+    principal_cache.put("y.w@g.c", "principal", principal_cache.generation)
+    item_1.id = 1
+    depreciation_schedules.prices([item_1], date(2026, 1, 1))
+    key = ("move_out", 1, 1, date(2026, 1, 1), ())
+    quote_cache.put(key, "quote", quote_cache.generation)
+
+    assert client.post("/reset/").status_code == 200
+    for cache in (principal_cache, depreciation_schedules, quote_cache):
+        assert cache.stats()["size"] == 0
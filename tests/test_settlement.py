@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from src import balances, ledger
+from src.models import Flat, Item, Transaction, User
+from src.settlement import simplify
+
+
+def test_simplify_nets_chains():
+    # 1 owes 2 10, 2 owes 3 10: a single transfer from 1 to 3
+    transfers = simplify({1: -10.0, 2: 0.0, 3: 10.0})
+    assert [(t.debtor_id, t.creditor_id, t.amount) for t in transfers] == [(1, 3, 10.0)]
+
+
+def test_simplify_uses_at_most_n_minus_one_transfers():
+    net = {1: -30.0, 2: -20.0, 3: 5.0, 4: 15.0, 5: 30.0}
+    transfers = simplify(net)
+    assert len(transfers) <= len(net) - 1
+    settled = dict(net)
+    for transfer in transfers:
+        settled[transfer.debtor_id] += transfer.amount
+        settled[transfer.creditor_id] -= transfer.amount
+    assert all(amount == pytest.approx(0) for amount in settled.values())
+
+
+def test_settle_flat(
+    client: TestClient,
+    session: Session,
+    flat_2_users_item: tuple[Flat, User, User, Item],
+):
+    flat, user_1, user_2, item = flat_2_users_item
+    new_user = User(first_name="New", last_name="User", email="n.u@g.c")
+    session.add(new_user)
+    session.commit()
+    date = datetime.strptime("2026-06-01", "%Y-%m-%d").date()
+    ledger.move_in(session, flat, new_user, date, [])
+    session.commit()
+
+    response = client.get(f"/flats/{flat.id}/settlement")
+    assert response.status_code == 200
+    planned = response.json()["transfers"]
+    assert {transfer["debtor_id"] for transfer in planned} == {new_user.id}
+
+    response = client.post(f"/flats/{flat.id}/settlement")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["transfers"] == planned
+    assert data["settled"] == 2
+    transactions = session.exec(select(Transaction)).all()
+    assert all(transaction.paid for transaction in transactions)
+    assert balances.check_balances(session) == []
+
+    response = client.get(f"/flats/{flat.id}/settlement")
+    assert response.json()["transfers"] == []
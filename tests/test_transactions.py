@@ -0,0 +1,129 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from src import balances
+from src.models import Flat, Item, Transaction, User
+
+
+def add_transactions(
+    session: Session, flat: Flat, user_1: User, user_2: User, item: Item
+):
+    flat.users = [user_1, user_2]
+    session.add(flat)
+    session.commit()
+    item.flat_id = flat.id
+    session.add(item)
+    session.commit()
+    for day, (amount, paid) in enumerate([(10, False), (20, False), (30, True)], 1):
+        session.add(
+            Transaction(
+                creditor_id=user_2.id,  # type: ignore
+                debtor_id=user_1.id,  # type: ignore
+                item_id=item.id,  # type: ignore
+                amount=amount,
+                paid=paid,
+                created_at=datetime(2025, 1, day),
+            )
+        )
+    session.commit()
+
+
+def test_fetch_user_debts_filters(
+    client: TestClient,
+    session: Session,
+    flat_1: Flat,
+    user_1: User,
+    user_2: User,
+    item_1: Item,
+):
+    add_transactions(session, flat_1, user_1, user_2, item_1)
+
+    response = client.get(f"/transactions/{user_1.id}/debts")
+    assert response.status_code == 200
+    assert [debt["amount"] for debt in response.json()] == [10, 20]
+
+    response = client.get(f"/transactions/{user_1.id}/debts", params={"paid": True})
+    assert [debt["amount"] for debt in response.json()] == [30]
+
+    response = client.get(
+        f"/transactions/{user_1.id}/debts",
+        params={"since": "2025-01-02T00:00:00", "order": "desc"},
+    )
+    assert [debt["amount"] for debt in response.json()] == [20]
+
+    response = client.get(
+        f"/transactions/{user_1.id}/debts", params={"creditor_id": user_1.id}
+    )
+    assert response.json() == []
+
+
+def test_fetch_user_credits_pages(
+    client: TestClient,
+    session: Session,
+    flat_1: Flat,
+    user_1: User,
+    user_2: User,
+    item_1: Item,
+):
+    add_transactions(session, flat_1, user_1, user_2, item_1)
+
+    response = client.get(
+        f"/transactions/{user_2.id}/credits",
+        params={"limit": 1, "order": "desc", "item_id": item_1.id},
+    )
+    assert response.status_code == 200
+    assert [credit["amount"] for credit in response.json()] == [20]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(
+        f"/transactions/{user_2.id}/credits",
+        params={"limit": 1, "order": "desc", "cursor": cursor},
+    )
+    assert [credit["amount"] for credit in response.json()] == [10]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_update_transactions_in_bulk(
+    client: TestClient,
+    session: Session,
+    flat_1: Flat,
+    user_1: User,
+    user_2: User,
+    item_1: Item,
+):
+    add_transactions(session, flat_1, user_1, user_2, item_1)
+    other = User(first_name="Other", last_name="User", email="o.u@g.c")
+    session.add(other)
+    session.commit()
+    session.add(
+        Transaction(
+            creditor_id=user_2.id,  # type: ignore
+            debtor_id=other.id,  # type: ignore
+            item_id=item_1.id,  # type: ignore
+            amount=40,
+            paid=False,
+        )
+    )
+    balances.rebuild_balances(session)
+    session.commit()
+
+    response = client.patch(
+        "/transactions/",
+        json={"paid": True, "counterparty_id": user_2.id, "before": "2025-01-02"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"updated": 1}
+
+    # The transaction between the two other users is not the current user's to settle
+    response = client.patch("/transactions/", json={"paid": True, "item_id": item_1.id})
+    assert response.json() == {"updated": 1}
+    unpaid = [t.amount for t in session.exec(select(Transaction)) if not t.paid]
+    assert unpaid == [40]
+    assert balances.check_balances(session) == []
+
+
+def test_update_transactions_needs_a_selection(client: TestClient):
+    response = client.patch("/transactions/", json={"paid": True})
+    assert response.status_code == 400
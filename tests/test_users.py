@@ -161,3 +161,26 @@ def test_delete_user(client: TestClient, session: Session, user_1: User):
 
     deleted_user = session.get(User, user_1.id)
     assert deleted_user is None
+
+
+def test_fetch_users_pages(
+    client: TestClient, session: Session, user_1: User, user_2: User
+):
+    session.add(user_1)
+    session.add(user_2)
+    session.commit()
+
+    response = client.get("/users/", params={"limit": 1})
+    assert response.status_code == 200
+    assert [user["first_name"] for user in response.json()] == ["Yann"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/users/", params={"limit": 1, "cursor": cursor})
+    assert response.status_code == 200
+    assert [user["first_name"] for user in response.json()] == ["Ilias"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_fetch_users_invalid_cursor(client: TestClient):
+    response = client.get("/users/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
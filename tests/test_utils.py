@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from src.utils import apply_sqlite_profile, async_database_url, engine_options
+
+
+def test_async_database_url():
+    assert (
+        async_database_url("sqlite:///database.db") == "sqlite+aiosqlite:///database.db"
+    )
+    assert (
+        async_database_url("postgresql+psycopg://user:pw@db/flatshare")
+        == "postgresql+asyncpg://user:pw@db/flatshare"
+    )
+
+
+def test_engine_options_pool_sizes(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    options = engine_options("postgresql://user:pw@db/flatshare")
+    assert options["pool_size"] == 20
+    assert options["pool_pre_ping"] is False
+    assert "pool_size" not in engine_options("sqlite:///database.db")
+
+
+def test_sqlite_profile(tmp_path):
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    engine = create_engine(url)
+    read_engine = create_engine(url)
+    apply_sqlite_profile(engine)
+    apply_sqlite_profile(read_engine, read_only=True)
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        connection.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        connection.commit()
+    with read_engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql("INSERT INTO t VALUES (1)")